@@ -0,0 +1,88 @@
+"""
+Attack patterns compiled into spawn timelines.
+A pattern is described by a PatternSpec: how often it fires, how many
+bullets each volley has, and a builder that computes every volley's
+positions and velocities at once. compile_timeline() turns a spec into a
+SpawnTimeline sorted by frame, so each tick only has to emit the bullets
+that are due.
+"""
+
+import zlib
+from collections import namedtuple
+from functools import lru_cache
+import numpy as np
+from settings import *
+from bullets import SPRITE_INDEX, BEHAVIOR_INDEX
+
+# name:     label, also used to seed random patterns
+# period:   a volley fires on every frame divisible by this
+# build:    build(frames, rng, *params) -> dict of per-bullet values (x, y,
+#           vx, vy and optionally size, damage, sprite_type, behavior).
+#           frames is a column of volley frames, shape (volleys, 1), and
+#           each value broadcasts to (volleys, count)
+# count:    bullets per volley
+# variants: how many differently seeded versions a random pattern has
+# params:   extra arguments passed to build
+PatternSpec = namedtuple('PatternSpec', 'name period build count variants params',
+                         defaults=(1, 1, ()))
+
+class SpawnTimeline:
+    def __init__(self, frame, x, y, vx, vy, size, damage, sprite, behavior):
+        # One entry per bullet, sorted by the frame it spawns on
+        self.frame = frame
+        self.x = x
+        self.y = y
+        self.vx = vx
+        self.vy = vy
+        self.size = size
+        self.damage = damage
+        self.sprite = sprite
+        self.behavior = behavior
+    
+    def __len__(self):
+        return len(self.frame)
+    
+    def emit(self, bullets, first_frame, last_frame=None):
+        """Spawn every bullet due from first_frame through last_frame into a BulletPool.
+        Over a range, each bullet appears as many ticks into the next update as
+        its frame is after first_frame"""
+        if last_frame is None:
+            last_frame = first_frame
+        start = np.searchsorted(self.frame, first_frame, 'left')
+        end = np.searchsorted(self.frame, last_frame, 'right')
+        if start < end:
+            delay = self.frame[start:end] - first_frame if last_frame > first_frame else 0
+            bullets.spawn_batch(self.x[start:end], self.y[start:end],
+                                self.vx[start:end], self.vy[start:end],
+                                self.size[start:end], self.damage[start:end],
+                                self.sprite[start:end], self.behavior[start:end], delay=delay)
+
+@lru_cache(maxsize=TIMELINE_CACHE_SIZE)
+def compile_timeline(spec, duration, variant=0):
+    """Compile every volley of `spec` over frames 1..duration, memoized across fights"""
+    frames = np.arange(spec.period, duration + 1, spec.period)[:, None]
+    # Seed from the pattern name too, so patterns sharing a variant differ
+    rng = np.random.default_rng([zlib.crc32(spec.name.encode()), variant % spec.variants])
+    values = spec.build(frames, rng, *spec.params)
+    
+    shape = (len(frames), spec.count)
+    def per_bullet(name, default, dtype):
+        value = values.get(name, default)
+        if name == 'sprite_type':
+            value = SPRITE_INDEX.get(value, 0)
+        elif name == 'behavior':
+            value = BEHAVIOR_INDEX[value]
+        value = np.asarray(value, dtype=dtype)
+        return np.ascontiguousarray(np.broadcast_to(value, shape).ravel())
+    
+    return SpawnTimeline(
+        frame=np.repeat(frames.ravel(), spec.count),
+        x=per_bullet('x', 0, np.float64),
+        y=per_bullet('y', 0, np.float64),
+        vx=per_bullet('vx', 0, np.float64),
+        vy=per_bullet('vy', 0, np.float64),
+        size=per_bullet('size', BULLET_SIZE, np.int32),
+        damage=per_bullet('damage', 10, np.int32),
+        sprite=per_bullet('sprite_type', 'circle', np.int8),
+        behavior=per_bullet('behavior', 'linear', np.int8),
+    )
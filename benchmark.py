@@ -0,0 +1,412 @@
+"""
+Headless benchmarks for the frame hot paths.
+
+    python benchmark.py                              # run everything, print JSON
+    python benchmark.py --output baseline.json       # save results
+    python benchmark.py --compare baseline.json      # flag regressions
+    python benchmark.py --filter bullets             # only matching benchmarks
+
+Micro benchmarks time one call of a hot path; macro benchmarks time whole
+scripted fights through Combat, drawing every tick. Results are reported
+as median, p95 and p99 milliseconds per call.
+"""
+
+import os
+import sys
+import json
+import argparse
+import random
+import time
+
+# Benchmarks never open a real window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+from settings import *
+
+BENCHMARKS = {}
+
+def benchmark(name, samples=200, warmup=5):
+    """Register a benchmark; the decorated function returns (setup, run)"""
+    def register(factory):
+        BENCHMARKS[name] = (factory, samples, warmup)
+        return factory
+    return register
+
+def measure(setup, run, samples, warmup):
+    """Milliseconds taken by run(setup()) for each sample; setup isn't timed"""
+    timings = []
+    for i in range(warmup + samples):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+    return timings
+
+def summarize(timings):
+    """Median and tail latencies of a list of timings"""
+    return {
+        "median_ms": float(np.median(timings)),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "p99_ms": float(np.percentile(timings, 99)),
+        "samples": len(timings),
+    }
+
+class Environment:
+    """Display and fonts shared by every benchmark"""
+    def __init__(self):
+        pygame.init()
+        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.font = pygame.font.Font(None, UI_FONT_SIZE)
+        self.small_font = pygame.font.Font(None, SMALL_FONT_SIZE)
+
+env = None
+
+def filled_enemy(count, seed=0):
+    """An Enemy with `count` slow bullets scattered over the combat box"""
+    from enemy import Enemy
+    rng = np.random.default_rng(seed)
+    enemy = Enemy()
+    enemy.bullets.spawn_many(
+        rng.uniform(COMBAT_BOX_X, COMBAT_BOX_X + COMBAT_BOX_WIDTH, count),
+        rng.uniform(COMBAT_BOX_Y, COMBAT_BOX_Y + COMBAT_BOX_HEIGHT, count),
+        rng.uniform(-0.5, 0.5, count),
+        rng.uniform(-0.5, 0.5, count),
+        sprite_type=['circle', 'diamond', 'star', 'square'][seed % 4])
+    return enemy
+
+# --- Micro benchmarks ---------------------------------------------------
+
+for bullet_count in (100, 1000, 10000):
+    @benchmark(f"enemy.update_bullets[{bullet_count}]")
+    def update_bullets(count=bullet_count):
+        from player import Player
+        from enemy import update_bullets
+        player = Player()
+        def setup():
+            # Every sample starts from the same field, with a player that can
+            # be hit, so the collision test always runs
+            player.invincible = False
+            return filled_enemy(count).bullets
+        return setup, (lambda bullets: update_bullets(bullets, player))
+    
+    @benchmark(f"enemy.draw_bullets[{bullet_count}]")
+    def draw_bullets(count=bullet_count):
+        from enemy import draw_bullets
+        bullets = filled_enemy(count).bullets
+        return (lambda: bullets), (lambda bullets: draw_bullets(env.screen, bullets))
+
+# Rect-only against pixel-perfect collision, with the soul in a dense field
+for collision in ("rect", "mask"):
+    @benchmark(f"enemy.update_bullets[5000,{collision}]")
+    def update_bullets_collision(pixel_perfect=collision == "mask"):
+        from player import Player
+        from enemy import update_bullets
+        player = Player()
+        def setup():
+            # A fresh field and a hittable player every sample, like update_bullets[N]
+            player.invincible = False
+            return filled_enemy(5000).bullets
+        return setup, (lambda bullets: update_bullets(bullets, player, pixel_perfect))
+
+# One dodge tick over 2000 bullets with every enemy of the encounter
+# attacking and a volley due from each, so only spawning grows with the
+# enemy count; moving and colliding the shared world is paid once
+for encounter in ENCOUNTERS:
+    @benchmark(f"combat_sim.enemy_turn[{encounter}]")
+    def enemy_turn(encounter=encounter):
+        from combat_sim import CombatSim
+        sim = CombatSim(encounter=encounter)
+        def setup():
+            # Same attacks every sample, into a fresh field
+            sim.seed_streams(0)
+            sim.bullets = filled_enemy(2000).bullets
+            sim.build_encounter(encounter)
+            sim.player.invincible = False
+            for enemy in sim.enemies:
+                enemy.start_attack()
+                enemy.attack_timer = int(enemy.timeline.frame[0]) - 1
+            return sim
+        return setup, (lambda sim: sim.update_enemy_turn(0))
+
+# Broadphase alone: just after an update, when the grid is out of date, and
+# with the grid already built for the current positions
+for bullet_count, built in ((50, False), (200, False), (1000, False), (5000, False), (5000, True)):
+    @benchmark(f"bullets.collide_rect[{bullet_count}{',built' if built else ''}]")
+    def collide_rect(count=bullet_count, built=built):
+        bullets = filled_enemy(count).bullets
+        soul = pygame.Rect(COMBAT_BOX_X + COMBAT_BOX_WIDTH // 2, COMBAT_BOX_Y + COMBAT_BOX_HEIGHT // 2,
+                           PLAYER_SIZE, PLAYER_SIZE)
+        def setup():
+            for group in bullets.groups:
+                if built:
+                    group.spatial_index()
+                else:
+                    group.grid_stale = True
+            return bullets
+        return setup, (lambda bullets: bullets.collide_rect(soul))
+
+for bullet_count in (1000, 10000):
+    @benchmark(f"bullets.homing_update[{bullet_count}]")
+    def homing_update(count=bullet_count):
+        from bullets import BulletWorld
+        rng = np.random.default_rng(0)
+        world = BulletWorld()
+        world.spawn_many(rng.uniform(0, SCREEN_WIDTH, count), rng.uniform(0, SCREEN_HEIGHT, count),
+                         0, 0, behavior='homing')
+        world.target = pygame.Rect(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, PLAYER_SIZE, PLAYER_SIZE)
+        return (lambda: world), (lambda world: world.update())
+
+def particle_setup(effect_count):
+    """A fresh ParticleManager with `effect_count` mixed effects"""
+    from particles import ParticleManager
+    effect_types = ["stars", "explosion", "heal", "damage"]
+    manager = ParticleManager()
+    manager.seed(effect_count)
+    for i in range(effect_count):
+        manager.add_effect(400 + i % 50, 300 + i % 30, effect_types[i % len(effect_types)])
+    # Age the effects a little so particles are spread over their lifetimes
+    for _ in range(5):
+        manager.update()
+    return manager
+
+for effect_count in (1, 10, 50):
+    @benchmark(f"particles.update[{effect_count}]")
+    def particles_update(count=effect_count):
+        return (lambda: particle_setup(count)), (lambda manager: manager.update())
+    
+    @benchmark(f"particles.draw[{effect_count}]")
+    def particles_draw(count=effect_count):
+        manager = particle_setup(count)
+        return (lambda: manager), (lambda manager: manager.draw(env.screen))
+
+@benchmark("telemetry.record[1000]")
+def telemetry_record():
+    import tempfile
+    from telemetry import TelemetrySink
+    # The writer never wakes during the run, so only queueing is timed
+    sink = TelemetrySink(tempfile.mkdtemp(), queue_size=1000, flush_interval=3600)
+    def run(sink):
+        for frame in range(1000):
+            sink.record(16.7, 500, 120, 80, 1, 2, "enemy_turn")
+    return (lambda: sink.queue.clear() or sink), run
+
+@benchmark("menu.draw_background")
+def menu_background():
+    from menu import MainMenu
+    menu = MainMenu(env.screen, env.font, env.small_font)
+    def run(menu):
+        menu.update()
+        menu.draw_background()
+    return (lambda: menu), run
+
+def sprite_manager_timing(cache_dir):
+    """(setup, run) building a SpriteManager with its disk cache in `cache_dir`.
+    Only the build sees the patched directory, never the repo's own cache"""
+    import sprites
+    saved = sprites.SPRITE_CACHE_DIR
+    def setup():
+        sprites.SPRITE_CACHE_DIR = cache_dir
+    def run(state):
+        sprites.SpriteManager()
+        sprites.SPRITE_CACHE_DIR = saved
+    return setup, run
+
+@benchmark("sprites.SpriteManager[cold]", samples=50)
+def sprite_manager_cold():
+    # No disk cache: every sample generates and packs the sprites
+    return sprite_manager_timing("")
+
+@benchmark("sprites.SpriteManager[warm]", samples=50)
+def sprite_manager_warm():
+    import tempfile
+    # A temp cache, filled once here, so every sample loads the packed atlas
+    setup, run = sprite_manager_timing(tempfile.mkdtemp())
+    setup()
+    run(None)
+    return setup, run
+
+# --- Macro benchmarks ---------------------------------------------------
+
+def scripted_fight(combat, seed):
+    """Play and draw one fight: always FIGHT, random-walk during dodges"""
+    from controls import INPUT_UP, INPUT_DOWN, INPUT_LEFT, INPUT_RIGHT, INPUT_CONFIRM, PRESSED_SHIFT
+    from particles import particle_manager
+    rng = random.Random(seed)
+    moves = (0, INPUT_UP, INPUT_DOWN, INPUT_LEFT, INPUT_RIGHT)
+    combat.reset(seed)
+    particle_manager.clear()
+    while not combat.finished:
+        if combat.state == "player_turn":
+            buttons = INPUT_CONFIRM << PRESSED_SHIFT
+        else:
+            buttons = rng.choice(moves)
+        combat.step(buttons)
+        particle_manager.update()
+        env.screen.fill(BLACK)
+        combat.draw()
+
+@benchmark("combat.scripted_fight", samples=10, warmup=1)
+def fight():
+    from combat import Combat
+    combat = Combat(env.screen, env.font, env.small_font)
+    seeds = iter(range(1000))
+    return (lambda: next(seeds)), (lambda seed: scripted_fight(combat, seed))
+
+@benchmark("combat_sim.headless_fight", samples=20, warmup=2)
+def headless_fight():
+    from combat_sim import CombatSim
+    from simulate import run_fight, random_policy
+    sim = CombatSim()
+    rng = random.Random(0)
+    return (lambda: None), (lambda state: run_fight(sim, random_policy, rng))
+
+@benchmark("combat_sim.headless_fight[step=8]", samples=20, warmup=2)
+def coarse_headless_fight():
+    from combat_sim import CombatSim
+    from simulate import run_fight, random_policy
+    sim = CombatSim()
+    rng = random.Random(0)
+    return (lambda: None), (lambda state: run_fight(sim, random_policy, rng, step=8))
+
+def frame_loop(combat, seed, pipeline=None):
+    """Play one fight a tick per frame like scripted_fight, presenting every
+    frame; with a FramePipeline, each tick runs while the last one is drawn"""
+    from controls import INPUT_UP, INPUT_DOWN, INPUT_LEFT, INPUT_RIGHT, INPUT_CONFIRM, PRESSED_SHIFT
+    from particles import particle_manager
+    from render import dirty_rects
+    rng = random.Random(seed)
+    moves = (0, INPUT_UP, INPUT_DOWN, INPUT_LEFT, INPUT_RIGHT)
+    if pipeline is not None:
+        pipeline.clear()
+    combat.reset(seed)
+    particle_manager.clear()
+    while not combat.finished:
+        if combat.state == "player_turn":
+            buttons = INPUT_CONFIRM << PRESSED_SHIFT
+        else:
+            buttons = rng.choice(moves)
+        if pipeline is None:
+            combat.advance(buttons)
+        else:
+            pipeline.submit(combat, [buttons])
+        env.screen.fill(BLACK)
+        combat.draw(1.0, pipeline.frame if pipeline is not None else None)
+        dirty_rects.present()
+        if pipeline is not None:
+            pipeline.wait()
+
+for pipelined in (False, True):
+    @benchmark(f"combat.frame_loop[{'pipelined' if pipelined else 'sequential'}]", samples=5, warmup=1)
+    def frame_loop_fight(pipelined=pipelined):
+        from combat import Combat
+        from pipeline import FramePipeline
+        combat = Combat(env.screen, env.font, env.small_font, encounter="trio")
+        pipeline = FramePipeline() if pipelined else None
+        seeds = iter(range(1000))
+        return (lambda: next(seeds)), (lambda seed: frame_loop(combat, seed, pipeline))
+
+def scaled_scene(scale, scene):
+    """Open the display at a render scale and build a combat frame mid-attack, or the menu, for it"""
+    from render import create_display, view
+    screen = create_display(scale, "nearest")
+    font = pygame.font.Font(None, view.length(UI_FONT_SIZE))
+    small_font = pygame.font.Font(None, view.length(SMALL_FONT_SIZE))
+    if scene == "menu":
+        from menu import MainMenu
+        return screen, MainMenu(screen, font, small_font)
+    from combat import Combat
+    combat = Combat(screen, font, small_font, seed=0)
+    combat.start_enemy_turn()
+    for _ in range(120):
+        combat.step(0)
+    return screen, combat
+
+# Drawing alone at each render scale, which is what a smaller target saves,
+# then the combat frame presented too, paying for the software upscale to
+# the window. Registered last, since they change the display mode
+for scale in RENDER_SCALES:
+    for scene in ("combat", "menu"):
+        @benchmark(f"render.draw_{scene}[scale={scale}]", samples=100)
+        def render_draw(scale=scale, scene=scene):
+            screen, drawn = scaled_scene(scale, scene)
+            def run(drawn):
+                screen.fill(BLACK)
+                drawn.draw()
+            return (lambda: drawn), run
+    
+    for full in (False, True):
+        @benchmark(f"render.{'full_frame' if full else 'frame'}[scale={scale}]", samples=100)
+        def render_frame(scale=scale, full=full):
+            from render import dirty_rects
+            screen, combat = scaled_scene(scale, "combat")
+            def run(combat):
+                screen.fill(BLACK)
+                combat.draw()
+                if full:
+                    dirty_rects.invalidate()
+                dirty_rects.present()
+            return (lambda: combat), run
+
+# --- Runner -------------------------------------------------------------
+
+def run_benchmarks(name_filter=None):
+    """Run every registered benchmark whose name contains name_filter"""
+    global env
+    env = Environment()
+    results = {}
+    for name, (factory, samples, warmup) in BENCHMARKS.items():
+        if name_filter and name_filter not in name:
+            continue
+        setup, run = factory()
+        results[name] = summarize(measure(setup, run, samples, warmup))
+        print(f"{name:36s} median {results[name]['median_ms']:8.3f} ms  "
+              f"p95 {results[name]['p95_ms']:8.3f} ms  p99 {results[name]['p99_ms']:8.3f} ms",
+              file=sys.stderr)
+    return results
+
+def compare(results, baseline, tolerance):
+    """Names of benchmarks whose median got slower than baseline by more than tolerance"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["median_ms"]
+        after = result["median_ms"]
+        change = (after - before) / before if before else 0.0
+        flag = "REGRESSION" if change > tolerance else ""
+        print(f"{name:36s} {before:8.3f} -> {after:8.3f} ms ({change:+.1%}) {flag}", file=sys.stderr)
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the frame hot paths")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a saved run")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed median slowdown before flagging, as a fraction (default 0.10)")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    args = parser.parse_args()
+    
+    results = run_benchmarks(args.filter)
+    report = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(report + "\n")
+    else:
+        print(report)
+    
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
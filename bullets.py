@@ -0,0 +1,516 @@
+"""
+Structure-of-arrays bullet storage.
+Every live bullet is one slot in a set of parallel NumPy arrays, so a whole
+attack can be moved, culled and collided with a handful of vectorized
+operations instead of a Python loop over dicts. A BulletWorld keeps one
+pool per movement behavior, so each behavior's kernel only ever touches
+its own bullets.
+"""
+
+import numpy as np
+from settings import *
+from spatial_hash import SpatialHash
+from pools import POOL_POLICIES
+
+# Bullet sprite types, stored as small integers in BulletPool.sprite
+SPRITE_TYPES = ['circle', 'diamond', 'star', 'square']
+SPRITE_INDEX = {name: i for i, name in enumerate(SPRITE_TYPES)}
+
+# Movement patterns, stored as small integers in BulletPool.behavior
+BEHAVIORS = ['linear', 'zigzag', 'homing']
+BEHAVIOR_INDEX = {name: i for i, name in enumerate(BEHAVIORS)}
+
+class BulletPool:
+    # Array name -> dtype for every per-bullet field
+    FIELDS = {
+        'x': np.float64,
+        'y': np.float64,
+        'vx': np.float64,
+        'vy': np.float64,
+        'prev_x': np.float64,  # position before the last update, for interpolation
+        'prev_y': np.float64,
+        'size': np.int32,
+        'damage': np.int32,
+        'sprite': np.int8,
+        'behavior': np.int8,
+        'timer': np.int32,  # ticks alive; negative until spawned, partway through a long step
+        'serial': np.int64,  # spawn order, shared across a BulletWorld's pools
+        'alive': np.bool_,
+    }
+    
+    def __init__(self, capacity=BULLET_POOL_CAPACITY, max_capacity=BULLET_POOL_MAX,
+                 policy=BULLET_POOL_POLICY):
+        if policy not in POOL_POLICIES:
+            raise ValueError(f"Unknown pool policy {policy!r}, expected one of {POOL_POLICIES}")
+        self.count = 0
+        self.capacity = 0
+        # What spawning past capacity does: drop the new bullets, grow the
+        # arrays up to max_capacity, or retire the oldest bullets
+        self.max_capacity = max(capacity, max_capacity)
+        self.policy = policy
+        self.dropped = 0
+        self.recycled = 0
+        self.spawned = 0  # serial for the next bullet spawned
+        self.target = None  # Rect that homing bullets steer towards
+        self.step_ticks = 1  # ticks the last update covered
+        self.grid = SpatialHash()
+        self.grid_stale = True
+        self.grow(capacity)
+    
+    def __len__(self):
+        return self.count
+    
+    def grow(self, capacity):
+        """Make room for at least `capacity` bullets, keeping live ones"""
+        if capacity <= self.capacity:
+            return
+        new_capacity = max(capacity, min(self.capacity * 2, self.max_capacity))
+        for name, dtype in self.FIELDS.items():
+            array = np.zeros(new_capacity, dtype=dtype)
+            if self.capacity:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+        self.capacity = new_capacity
+    
+    def clear(self):
+        """Remove every bullet"""
+        self.count = 0
+        self.spawned = 0
+        self.target = None
+        self.grid_stale = True
+    
+    def spawn(self, x, y, vx, vy, size=BULLET_SIZE, damage=10, sprite_type='circle', behavior='linear'):
+        """Add a single bullet"""
+        self.spawn_many([x], [y], [vx], [vy], size, damage, sprite_type, behavior)
+    
+    def spawn_many(self, x, y, vx, vy, size=BULLET_SIZE, damage=10, sprite_type='circle', behavior='linear'):
+        """Add a batch of bullets; scalars are broadcast over the batch"""
+        self.spawn_batch(x, y, vx, vy, size, damage,
+                         SPRITE_INDEX.get(sprite_type, 0), BEHAVIOR_INDEX[behavior])
+    
+    def spawn_batch(self, x, y, vx, vy, size, damage, sprite, behavior, serial=None, delay=0):
+        """Add a batch of bullets given sprite and behavior indices.
+        delay is how many ticks into the coming update each bullet appears"""
+        x = np.asarray(x, dtype=np.float64)
+        added = x.size
+        if added == 0:
+            return
+        if serial is None:
+            serial = np.arange(self.spawned, self.spawned + added)
+            self.spawned += added
+        
+        overflow = self.count + added - self.capacity
+        if overflow > 0 and self.policy == 'grow':
+            self.grow(min(self.count + added, self.max_capacity))
+            overflow = self.count + added - self.capacity
+        if overflow > 0 and self.policy == 'recycle':
+            # Make room by retiring the oldest bullets
+            retired = min(overflow, self.count)
+            self.discard_oldest(retired)
+            self.recycled += retired
+            overflow -= retired
+        if overflow > 0:
+            # Whatever still doesn't fit is dropped, newest first
+            self.dropped += overflow
+            added -= overflow
+            if added == 0:
+                return
+            x, y, vx, vy, size, damage, sprite, behavior, serial, delay = (
+                value[:added] if np.ndim(value) else value
+                for value in (x, y, vx, vy, size, damage, sprite, behavior, serial, delay))
+        
+        start = self.count
+        end = start + added
+        
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.prev_x[start:end] = x
+        self.prev_y[start:end] = y
+        self.vx[start:end] = vx
+        self.vy[start:end] = vy
+        self.size[start:end] = size
+        self.damage[start:end] = damage
+        self.sprite[start:end] = sprite
+        self.behavior[start:end] = behavior
+        self.timer[start:end] = -delay
+        self.serial[start:end] = serial
+        self.alive[start:end] = True
+        self.count = end
+        self.grid_stale = True
+    
+    def rects(self):
+        """Integer (left, top, size) arrays for the live bullets, like pygame.Rect"""
+        n = self.count
+        # astype truncates toward zero, the same as assigning a float to Rect.x
+        return self.x[:n].astype(np.int32), self.y[:n].astype(np.int32), self.size[:n]
+    
+    def draw_rects(self, alpha=1.0):
+        """Like rects(), but interpolated `alpha` of the way from the previous tick"""
+        n = self.count
+        x = self.prev_x[:n] + (self.x[:n] - self.prev_x[:n]) * alpha
+        y = self.prev_y[:n] + (self.y[:n] - self.prev_y[:n]) * alpha
+        return x.astype(np.int32), y.astype(np.int32), self.size[:n]
+    
+    def update(self, ticks=1):
+        """Move every bullet `ticks` ticks, then drop the ones that left the screen"""
+        n = self.count
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+        if ticks == 1:
+            self.x[:n] += self.vx[:n]
+            self.y[:n] += self.vy[:n]
+        else:
+            # Bullets spawned partway through the step only move for the rest of it
+            moving = ticks + np.minimum(self.timer[:n], 0)
+            self.x[:n] += self.vx[:n] * moving
+            self.y[:n] += self.vy[:n] * moving
+        self.timer[:n] += ticks
+        self.step_ticks = ticks
+        
+        left, top, size = self.rects()
+        offscreen = ((left + size < 0) | (left > SCREEN_WIDTH) |
+                     (top + size < 0) | (top > SCREEN_HEIGHT))
+        self.alive[:n] &= ~offscreen
+        self.compact()
+        self.grid_stale = True
+    
+    def spatial_index(self):
+        """The collision grid, rebuilt if bullets moved since it was last built"""
+        if self.grid_stale:
+            self.grid.rebuild(*self.rects())
+            self.grid_stale = False
+        return self.grid
+    
+    def query_rect(self, rect):
+        """Indices of bullets that may overlap `rect` (broadphase only)"""
+        return self.spatial_index().query_rect(rect)
+    
+    def query_radius(self, x, y, radius):
+        """Indices of bullets whose center lies within `radius` of (x, y)"""
+        return self.spatial_index().query_radius(x, y, radius)
+    
+    def collide_rect(self, rect):
+        """Indices of live bullets overlapping `rect`, in spawn order"""
+        if self.grid_stale or self.count < HASH_MIN_BULLETS:
+            # Rebuilding the grid for one query costs more than testing every
+            # bullet, and even a built grid only pays off for big pools. The
+            # soul's test comes right after update(), so it always lands here;
+            # the grid itself serves query_radius callers such as difficulty.py
+            candidates = np.arange(self.count)
+            left, top, size = self.rects()
+        else:
+            candidates = self.query_rect(rect)
+            left = self.x[candidates].astype(np.int32)
+            top = self.y[candidates].astype(np.int32)
+            size = self.size[candidates]
+        overlap = ((left < rect.right) & (left + size > rect.left) &
+                   (top < rect.bottom) & (top + size > rect.top))
+        return candidates[overlap]
+    
+    def sweep_rect(self, start, end):
+        """(indices, enter, leave) of live bullets that overlapped a rect moving from
+        `start` to `end` during the last update, with the fractions of the update at
+        which each overlap began and ended"""
+        n = self.count
+        # A bullet spawned partway through the update only exists from `born`
+        # on, and makes its whole move in the rest of the update
+        born = self.spawn_times(slice(n))
+        move_x = (self.x[:n] - self.prev_x[:n]) / (1 - born)
+        move_y = (self.y[:n] - self.prev_y[:n]) / (1 - born)
+        
+        # Follow each bullet relative to the rect, which starts at the origin
+        left = self.prev_x[:n] - move_x * born - start.x
+        top = self.prev_y[:n] - move_y * born - start.y
+        motion_x = move_x - (end.x - start.x)
+        motion_y = move_y - (end.y - start.y)
+        size = self.size[:n]
+        enter_x, leave_x = slab(left, motion_x, -size, start.width)
+        enter_y, leave_y = slab(top, motion_y, -size, start.height)
+        enter = np.maximum(np.maximum(enter_x, enter_y), born)
+        leave = np.minimum(np.minimum(leave_x, leave_y), 1.0)
+        hits = np.flatnonzero(enter < leave)
+        return hits, enter[hits], leave[hits]
+    
+    def spawn_times(self, index):
+        """Fraction of the last update gone when the bullets at `index` spawned; 0 for older ones"""
+        return np.maximum(self.step_ticks - self.timer[index], 0) / self.step_ticks
+    
+    def kill(self, index):
+        """Remove the bullet at `index`"""
+        self.alive[index] = False
+        self.compact()
+    
+    def discard_oldest(self, count):
+        """Remove the `count` longest-lived bullets"""
+        n = self.count
+        for name in self.FIELDS:
+            array = getattr(self, name)
+            array[:n - count] = array[count:n]
+        self.count = n - count
+        self.grid_stale = True
+    
+    def compact(self):
+        """Pack live bullets to the front of the arrays, keeping their order"""
+        n = self.count
+        keep = np.flatnonzero(self.alive[:n])
+        if keep.size == n:
+            return
+        for name in self.FIELDS:
+            array = getattr(self, name)
+            array[:keep.size] = array[keep]
+        self.count = keep.size
+        self.grid_stale = True
+
+def slab(offset, motion, low, high):
+    """When offset + t * motion enters and leaves the open interval (low, high)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_low = (low - offset) / motion
+        t_high = (high - offset) / motion
+    enter = np.minimum(t_low, t_high)
+    leave = np.maximum(t_low, t_high)
+    
+    # Without motion it is either inside the whole time or never
+    still = motion == 0
+    if still.any():
+        inside = (offset > low) & (offset < high)
+        enter[still] = np.where(inside[still], -np.inf, np.inf)
+        leave[still] = np.where(inside[still], np.inf, -np.inf)
+    return enter, leave
+
+# --- Behavior kernels: each moves only its own group's bullets ----------
+# A kernel runs once per update, before the bullets move, and is told how
+# many ticks the update covers
+
+def zigzag_kernel(pool, ticks=1):
+    """Reverse horizontal direction every 20 frames"""
+    n = len(pool)
+    timer = pool.timer[:n]
+    # An odd number of reversals during the step flips the direction
+    reversals = (timer + ticks) // 20 - np.maximum(timer, 0) // 20
+    pool.vx[:n][reversals % 2 == 1] *= -1
+
+def homing_kernel(pool, ticks=1):
+    """Slowly steer every bullet towards pool.target"""
+    target = pool.target
+    n = len(pool)
+    if not target or not n:
+        return
+    # The target is the same for every bullet, so only the deltas are per bullet
+    dx = target.centerx - pool.x[:n]
+    dy = target.centery - pool.y[:n]
+    distance = np.hypot(dx, dy)
+    moving = distance > 0
+    if not moving.all():
+        distance[~moving] = 1  # bullets already on the target keep their velocity
+    
+    homing_strength = 0.1
+    if ticks > 1:
+        # The pull towards the target compounds over the step
+        homing_strength = 1 - (1 - homing_strength) ** ticks
+    steer_x = ((dx / distance) * 2 - pool.vx[:n]) * homing_strength
+    steer_y = ((dy / distance) * 2 - pool.vy[:n]) * homing_strength
+    pool.vx[:n] += np.where(moving, steer_x, 0)
+    pool.vy[:n] += np.where(moving, steer_y, 0)
+
+# Behavior name -> kernel run on that behavior's group before it moves
+# (None for plain straight-line bullets)
+BEHAVIOR_KERNELS = {
+    'linear': None,
+    'zigzag': zigzag_kernel,
+    'homing': homing_kernel,
+}
+
+def register_behavior(name, kernel):
+    """Add a movement behavior; BulletWorlds created afterwards get a group for it"""
+    if name not in BEHAVIOR_INDEX:
+        BEHAVIOR_INDEX[name] = len(BEHAVIORS)
+        BEHAVIORS.append(name)
+    BEHAVIOR_KERNELS[name] = kernel
+
+def concatenate_fields(parts):
+    """Join per-group tuples of arrays into one tuple of arrays"""
+    if len(parts) == 1:
+        return parts[0]
+    return tuple(np.concatenate(field) for field in zip(*parts))
+
+class BulletWorld:
+    """One BulletPool per movement behavior, used like a single pool"""
+    def __init__(self, capacity=BULLET_POOL_CAPACITY, max_capacity=BULLET_POOL_MAX,
+                 policy=BULLET_POOL_POLICY):
+        if policy not in POOL_POLICIES:
+            raise ValueError(f"Unknown pool policy {policy!r}, expected one of {POOL_POLICIES}")
+        # The limits hold for the world as a whole, however many behaviors
+        # there are. Groups share the preallocated capacity and grow into
+        # whatever the world allows
+        self.capacity = capacity
+        self.max_capacity = max(capacity, max_capacity)
+        self.policy = policy
+        self.dropped = 0
+        self.recycled = 0
+        share = max(capacity // len(BEHAVIORS), 1)
+        self.groups = [BulletPool(share, self.max_capacity, 'grow') for _ in BEHAVIORS]
+        self.kernels = [BEHAVIOR_KERNELS[name] for name in BEHAVIORS]
+        self.spawned = 0  # serial for the next bullet, across every group
+        self.target = None  # Rect that homing bullets steer towards
+    
+    def __len__(self):
+        return sum(group.count for group in self.groups)
+    
+    def group(self, behavior):
+        """The pool holding every bullet with this behavior"""
+        return self.groups[BEHAVIOR_INDEX[behavior]]
+    
+    def clear(self):
+        """Remove every bullet"""
+        for group in self.groups:
+            group.clear()
+        self.spawned = 0
+        self.target = None
+    
+    def spawn(self, x, y, vx, vy, size=BULLET_SIZE, damage=10, sprite_type='circle', behavior='linear'):
+        """Add a single bullet"""
+        self.spawn_many([x], [y], [vx], [vy], size, damage, sprite_type, behavior)
+    
+    def spawn_many(self, x, y, vx, vy, size=BULLET_SIZE, damage=10, sprite_type='circle', behavior='linear'):
+        """Add a batch of bullets; scalars are broadcast over the batch"""
+        self.spawn_batch(x, y, vx, vy, size, damage,
+                         SPRITE_INDEX.get(sprite_type, 0), BEHAVIOR_INDEX[behavior])
+    
+    def spawn_batch(self, x, y, vx, vy, size, damage, sprite, behavior, delay=0):
+        """Add a batch of bullets, each into its behavior's group"""
+        x = np.asarray(x, dtype=np.float64)
+        added = x.size
+        if added == 0:
+            return
+        serial = np.arange(self.spawned, self.spawned + added)
+        self.spawned += added
+        
+        count = len(self)
+        overflow = count + added - self.capacity
+        if overflow > 0 and self.policy == 'grow':
+            self.capacity = min(max(count + added, self.capacity * 2), self.max_capacity)
+            overflow = count + added - self.capacity
+        if overflow > 0 and self.policy == 'recycle':
+            # Make room by retiring the oldest bullets in the whole world
+            retired = min(overflow, count)
+            self.discard_oldest(retired)
+            self.recycled += retired
+            overflow -= retired
+        if overflow > 0:
+            # Whatever still doesn't fit is dropped, newest first
+            self.dropped += overflow
+            added -= overflow
+            if added == 0:
+                return
+            x, y, vx, vy, size, damage, sprite, behavior, serial, delay = (
+                value[:added] if np.ndim(value) else value
+                for value in (x, y, vx, vy, size, damage, sprite, behavior, serial, delay))
+        
+        if np.ndim(behavior) == 0:
+            self.groups[int(behavior)].spawn_batch(x, y, vx, vy, size, damage, sprite, behavior, serial, delay)
+            return
+        behavior = np.asarray(behavior)
+        # Timelines usually emit a single behavior per batch
+        if behavior[0] == behavior[-1] and (behavior == behavior[0]).all():
+            self.groups[int(behavior[0])].spawn_batch(x, y, vx, vy, size, damage, sprite,
+                                                     behavior, serial, delay)
+            return
+        for index in np.unique(behavior):
+            members = behavior == index
+            self.groups[int(index)].spawn_batch(*(
+                np.broadcast_to(value, x.shape)[members] if np.ndim(value) else value
+                for value in (x, y, vx, vy, size, damage, sprite, behavior, serial, delay)))
+    
+    def discard_oldest(self, count):
+        """Remove the `count` earliest-spawned bullets, whichever groups they are in"""
+        serials = np.concatenate([group.serial[:group.count] for group in self.groups])
+        cutoff = np.partition(serials, count - 1)[count - 1]
+        # Each group is in spawn order, so its oldest bullets lead it
+        for group in self.groups:
+            retired = int(np.searchsorted(group.serial[:group.count], cutoff, 'right'))
+            if retired:
+                group.discard_oldest(retired)
+    
+    def update(self, ticks=1):
+        """Run each group's behavior kernel, then move and cull its bullets, `ticks` ticks at once"""
+        for group, kernel in zip(self.groups, self.kernels):
+            if group.count:
+                group.target = self.target
+                if kernel is not None:
+                    kernel(group, ticks)
+                group.update(ticks)
+    
+    def collide_rect(self, rect):
+        """(group, index) of live bullets overlapping `rect`, in spawn order"""
+        hits = []
+        for group in self.groups:
+            if group.count:
+                hits.extend((int(group.serial[i]), group, i) for i in group.collide_rect(rect).tolist())
+        hits.sort(key=lambda hit: hit[0])
+        return [(group, index) for _, group, index in hits]
+    
+    def sweep_rect(self, start, end):
+        """(group, index, enter, leave) of live bullets that overlapped a rect moving from
+        `start` to `end` during the last update, by time of impact, then spawn order"""
+        hits = []
+        for group in self.groups:
+            if group.count:
+                indices, enter, leave = group.sweep_rect(start, end)
+                hits.extend((time_in, int(group.serial[i]), group, i, time_out)
+                            for i, time_in, time_out in zip(indices.tolist(), enter.tolist(), leave.tolist()))
+        hits.sort(key=lambda hit: hit[:2])
+        return [(group, index, enter, leave) for enter, _, group, index, leave in hits]
+    
+    def query_radius(self, x, y, radius):
+        """(group, indices) for every group with bullets centered within `radius` of (x, y)"""
+        found = []
+        for group in self.groups:
+            if group.count:
+                indices = group.query_radius(x, y, radius)
+                if len(indices):
+                    found.append((group, indices))
+        return found
+    
+    def active_groups(self):
+        """Groups holding bullets, or just the first group if none do"""
+        return [group for group in self.groups if group.count] or self.groups[:1]
+    
+    def rects(self):
+        """Integer (left, top, size) arrays for every live bullet, group by group"""
+        return concatenate_fields([group.rects() for group in self.active_groups()])
+    
+    def draw_rects(self, alpha=1.0):
+        """Like rects(), but interpolated `alpha` of the way from the previous tick"""
+        return concatenate_fields([group.draw_rects(alpha) for group in self.active_groups()])
+    
+    def sprites(self):
+        """Sprite index of every live bullet, in the same order as rects()"""
+        return concatenate_fields([(group.sprite[:group.count],) for group in self.active_groups()])[0]
+    
+    def snapshot(self):
+        """A copy of what drawing reads, for drawing while the world keeps moving"""
+        return BulletSnapshot(self)
+
+class BulletSnapshot:
+    """Every live bullet's position and sprite, copied out of a BulletWorld between ticks.
+    Draws like the world it came from: see enemy.draw_bullets"""
+    def __init__(self, world):
+        fields = concatenate_fields([
+            (group.prev_x[:group.count], group.prev_y[:group.count], group.x[:group.count],
+             group.y[:group.count], group.size[:group.count], group.sprite[:group.count])
+            for group in world.active_groups()])
+        # A single group's fields are views into its arrays, which keep changing
+        self.prev_x, self.prev_y, self.x, self.y, self.size, self.sprite = (field.copy() for field in fields)
+    
+    def __len__(self):
+        return len(self.x)
+    
+    def draw_rects(self, alpha=1.0):
+        """Integer (left, top, size) arrays, `alpha` of the way from the previous tick"""
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        y = self.prev_y + (self.y - self.prev_y) * alpha
+        return x.astype(np.int32), y.astype(np.int32), self.size
+    
+    def sprites(self):
+        """Sprite index of every bullet, in the same order as draw_rects()"""
+        return self.sprite
@@ -0,0 +1,56 @@
+"""
+Pixel-perfect collision between bullets and the soul. The contact table
+only needs the masks of the heart and bullet sprites, so those few are
+drawn on their own rather than taken from the SpriteManager: headless
+fights never build the sprite atlas or touch its disk cache.
+"""
+
+import pygame
+import numpy as np
+from bullets import SPRITE_TYPES
+from sprites import SpriteManager, BULLET_SPRITE_NAMES, COLLISION_SPRITE_NAMES
+
+class HeartContacts:
+    def __init__(self):
+        sprites = SpriteManager.draw_collision_sprites()
+        self.masks = {name: pygame.mask.from_surface(sprites[name]) for name in COLLISION_SPRITE_NAMES}
+        self.build_table()
+    
+    def build_table(self):
+        """Tabulate, for each bullet sprite, every offset from the heart at which their pixels touch"""
+        heart = self.masks['player_heart']
+        heart_width, heart_height = heart.get_size()
+        bullet_masks = [self.masks[BULLET_SPRITE_NAMES[name]] for name in SPRITE_TYPES]
+        
+        # Bit (x, y) of heart.convolve(bullet) is set when the two overlap
+        # with the bullet's top left at (x - width + 1, y - height + 1)
+        self.table = []
+        for mask in bullet_masks:
+            width, height = mask.get_size()
+            # Convolution cell of a bullet centered on the heart
+            origin_x = heart_width // 2 + width - 1 - width // 2
+            origin_y = heart_height // 2 + height - 1 - height // 2
+            rows, columns = np.nonzero(self.mask_array(heart.convolve(mask)))
+            # Kept as a set of center offsets, indexed like BulletPool.sprite:
+            # one hash lookup per test, with no bounds to check
+            self.table.append(frozenset(zip((columns - origin_x).tolist(), (rows - origin_y).tolist())))
+    
+    @staticmethod
+    def mask_array(mask):
+        """A mask as a boolean array indexed [y, x]"""
+        width, height = mask.get_size()
+        return np.array([[mask.get_at((x, y)) for x in range(width)] for y in range(height)], dtype=bool)
+    
+    def bullet_touches_heart(self, sprite, dx, dy):
+        """True if a bullet sprite centered (dx, dy) from the heart's center shares a visible pixel with it"""
+        return (dx, dy) in self.table[sprite]
+
+# Global contact table, built on the first pixel-perfect check
+heart_contacts = None
+
+def get_heart_contacts():
+    """Get the global heart contact table"""
+    global heart_contacts
+    if heart_contacts is None:
+        heart_contacts = HeartContacts()
+    return heart_contacts
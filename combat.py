@@ -1,213 +1,163 @@
 import pygame
-from player import Player
-from enemy import Enemy
+from combat_sim import CombatSim
+from controls import *
 from settings import *
+from text_cache import render_text
 from particles import particle_manager
+from render import dirty_rects, view
+from profiler import profiler
+from scenes import preloader
+from sprites import get_sprite_manager
+from enemy import ATTACK_PATTERNS, draw_bullets
+from attacks.timeline import compile_timeline
 
-class Combat:
-    def __init__(self, screen, font, small_font):
+def preload_assets():
+    """Build what fights need ahead of time: sprites and every attack's timelines"""
+    get_sprite_manager()
+    for pattern in ATTACK_PATTERNS:
+        for variant in range(pattern.variants):
+            compile_timeline(pattern, ATTACK_DURATION, variant)
+
+class Combat(CombatSim):
+    """CombatSim wired to pygame input and drawn to the screen"""
+    def __init__(self, screen, font, small_font, seed=None, encounter=DEFAULT_ENCOUNTER):
+        super().__init__(effects=particle_manager, seed=seed, encounter=encounter)
+        self.preloader = preloader  # compile each attack during its turn transition
         self.screen = screen
         self.font = font
         self.small_font = small_font
         
-        # Combat state
-        self.state = "player_turn"  # player_turn, enemy_turn, game_over, victory
-        self.player = Player()
-        self.enemy = Enemy()
+        # Presses collected from events until the next tick consumes them
+        self.pressed = 0
         
-        # UI state
-        self.message = ""
-        self.message_timer = 0
-        self.turn_transition_timer = 0
+        # Replay hooks: a ReplayRecorder capturing every tick's input, and an
+        # iterator of recorded input that replaces the keyboard
+        self.recorder = None
+        self.playback = None
         
-    def reset(self):
+        # State drawn last frame; the static layout changes with it
+        self.drawn_state = None
+    
+    def reset(self, seed=None, encounter=None):
         """Reset combat for new fight"""
-        self.state = "player_turn"
-        self.player.reset()
-        self.enemy.reset()
-        self.message = ""
-        self.message_timer = 0
-        self.turn_transition_timer = 0
-        
+        super().reset(seed, encounter)
+        self.pressed = 0
+    
     def handle_event(self, event):
         """Handle pygame events"""
         if event.type == pygame.KEYDOWN:
-            if self.state == "player_turn":
-                if event.key == pygame.K_LEFT and self.player.selected_action > 0:
-                    self.player.selected_action -= 1
-                elif event.key == pygame.K_RIGHT and self.player.selected_action < len(self.player.actions) - 1:
-                    self.player.selected_action += 1
-                elif event.key == pygame.K_z or event.key == pygame.K_RETURN:
-                    self.execute_player_action()
+            self.pressed |= pressed_buttons(event.key)
     
     def update(self):
         """Update combat logic"""
-        keys = pygame.key.get_pressed()
-        
-        # Update timers
-        if self.message_timer > 0:
-            self.message_timer -= 1
-        if self.turn_transition_timer > 0:
-            self.turn_transition_timer -= 1
-        
-        # Update player
-        self.player.update()
-        
-        # Update particle effects
-        particle_manager.update()
-        
-        # State machine
-        if self.state == "player_turn":
-            self.update_player_turn(keys)
-        elif self.state == "enemy_turn":
-            self.update_enemy_turn(keys)
-        elif self.state == "turn_transition":
-            self.update_turn_transition()
-        
-        # Check win/lose conditions
-        if self.player.hp <= 0:
-            self.state = "game_over"
-        elif self.enemy.hp <= 0:
-            self.state = "victory"
-            self.show_message("Victory! Enemy defeated!", 180)
+        self.advance(self.poll_buttons())
     
-    def update_player_turn(self, keys):
-        """Handle player's turn logic"""
-        # Menu navigation is now handled in handle_event method
-        pass
+    def poll_buttons(self):
+        """Input for the next tick: the recorded input when replaying, else the keyboard"""
+        if self.playback is not None:
+            return next(self.playback, 0)
+        buttons = held_buttons(pygame.key.get_pressed()) | self.pressed
+        self.pressed = 0
+        return buttons
     
-    def execute_player_action(self):
-        """Execute the selected player action"""
-        action = self.player.actions[self.player.selected_action]
-        
-        if action == "FIGHT":
-            damage = 15  # Base damage
-            # Add damage particle effect
-            particle_manager.add_effect(SCREEN_WIDTH - 150, 80, "explosion")
-            if self.enemy.take_damage(damage):
-                self.show_message(f"You dealt {damage} damage! Enemy defeated!", 120)
-                self.state = "victory"
-            else:
-                self.show_message(f"You dealt {damage} damage!", 120)
-                self.start_enemy_turn()
-        
-        elif action == "ACT":
-            # Add star effect
-            particle_manager.add_effect(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, "stars")
-            self.show_message("You try to reason with the enemy...", 120)
-            self.start_enemy_turn()
-        
-        elif action == "ITEM":
-            heal_amount = 20
-            self.player.hp = min(self.player.max_hp, self.player.hp + heal_amount)
-            # Add healing particle effect
-            particle_manager.add_effect(self.player.rect.centerx, self.player.rect.centery, "heal")
-            self.show_message(f"You healed {heal_amount} HP!", 120)
-            self.start_enemy_turn()
-        
-        elif action == "MERCY":
-            if self.enemy.hp < self.enemy.max_hp * 0.3:  # Can only spare when enemy is low HP
-                self.show_message("Enemy spared! Victory!", 120)
-                self.state = "victory"
-            else:
-                self.show_message("Enemy doesn't want mercy yet...", 120)
-                self.start_enemy_turn()
-    
-    def start_enemy_turn(self):
-        """Start enemy's attack phase"""
-        self.state = "turn_transition"
-        self.turn_transition_timer = 60  # 1 second transition
-        self.show_message("Enemy attacks!", 60)
-    
-    def update_turn_transition(self):
-        """Handle transition between turns"""
-        if self.turn_transition_timer <= 0:
-            self.state = "enemy_turn"
-            self.enemy.start_attack()
+    def attacks_compiling(self):
+        """Recorded input alone decides when a replay waits, however long compiling takes now"""
+        return self.playback is None and super().attacks_compiling()
     
-    def update_enemy_turn(self, keys):
-        """Handle enemy's turn (dodge phase)"""
-        # Player can move to dodge
-        self.player.handle_input_dodge(keys)
+    def advance(self, buttons):
+        """Run one tick with the given input; never touches pygame, so it can run off the main thread"""
+        recording = self.recorder is not None and not self.finished
+        self.step(buttons)
+        if recording:
+            # Recorded after the step, which decides whether the tick waited
+            self.recorder.record(buttons | (TRANSITION_WAIT if self.waiting_for_attacks else 0))
         
-        # Update enemy attack
-        self.enemy.update(self.player)
-        
-        # Check if attack is finished
-        if self.enemy.attack_finished:
-            self.state = "player_turn"
-            self.player.made_move = False
-            self.show_message("Your turn!", 60)
-    
-    def show_message(self, text, duration=120):
-        """Show a message for a specified duration"""
-        self.message = text
-        self.message_timer = duration
+        # Update particle effects
+        with profiler.span("particles"):
+            particle_manager.update()
     
-    def draw(self):
-        """Draw the combat scene"""
-        if self.state == "player_turn":
-            self.draw_player_turn()
-        elif self.state == "enemy_turn" or self.state == "turn_transition":
-            self.draw_enemy_turn()
-        elif self.state == "victory":
+    def draw(self, alpha=1.0, frame=None):
+        """Draw the combat scene, `alpha` of the way between the last two ticks.
+        `frame` is a CombatSnapshot to draw in place of the live fight"""
+        if frame is None:
+            frame = self
+        if frame.state != self.drawn_state:
+            dirty_rects.invalidate()
+            self.drawn_state = frame.state
+        
+        if frame.state == "player_turn":
+            self.draw_player_turn(frame)
+        elif frame.state == "enemy_turn" or frame.state == "turn_transition":
+            self.draw_enemy_turn(frame, alpha)
+        elif frame.state == "victory":
             self.draw_victory()
         
         # Always draw HP bars
-        self.player.draw_hp_bar(self.screen, self.small_font)
-        self.enemy.draw(self.screen, self.small_font)
+        frame.player.draw_hp_bar(self.screen, self.small_font)
+        choosing = len(frame.enemies) > 1
+        for enemy in frame.enemies:
+            enemy.draw(self.screen, self.small_font, choosing and enemy is frame.enemy)
+        
+        # Draw combat box and every enemy's bullets, once per frame
+        pygame.draw.rect(self.screen, WHITE, 
+                        view.rect((COMBAT_BOX_X, COMBAT_BOX_Y, COMBAT_BOX_WIDTH, COMBAT_BOX_HEIGHT)), view.length(2))
+        with profiler.span("bullets"):
+            draw_bullets(self.screen, frame.bullets, alpha)
         
         # Draw particle effects
-        particle_manager.draw(self.screen)
+        frame.effects.draw(self.screen)
         
         # Draw message if active
-        if self.message_timer > 0:
-            self.draw_message()
+        if frame.message_timer > 0:
+            self.draw_message(frame)
     
-    def draw_player_turn(self):
+    def draw_player_turn(self, frame):
         """Draw UI for player's turn"""
         # Draw action menu
-        self.player.draw_menu(self.screen, self.font)
+        frame.player.draw_menu(self.screen, self.font)
         
         # Draw instructions
-        instruction_text = self.small_font.render("Use LEFT/RIGHT arrows to select, Z/ENTER to confirm", True, WHITE)
-        instruction_rect = instruction_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 50))
+        instructions = "Use LEFT/RIGHT arrows to select, Z/ENTER to confirm"
+        if len(frame.enemies) > 1:
+            instructions = "LEFT/RIGHT to select, UP/DOWN to target, Z/ENTER to confirm"
+        instruction_text = render_text(self.small_font, instructions, True, WHITE)
+        instruction_rect = instruction_text.get_rect(center=view.point(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 50))
         self.screen.blit(instruction_text, instruction_rect)
         
         # Draw combat box (empty during menu)
         pygame.draw.rect(self.screen, WHITE, 
-                        (COMBAT_BOX_X, COMBAT_BOX_Y, COMBAT_BOX_WIDTH, COMBAT_BOX_HEIGHT), 2)
+                        view.rect((COMBAT_BOX_X, COMBAT_BOX_Y, COMBAT_BOX_WIDTH, COMBAT_BOX_HEIGHT)), view.length(2))
     
-    def draw_enemy_turn(self):
+    def draw_enemy_turn(self, frame, alpha=1.0):
         """Draw UI for enemy's turn (dodge phase)"""
         # Draw player
-        self.player.draw(self.screen)
+        frame.player.draw(self.screen, alpha)
         
         # Draw instructions
-        instruction_text = self.small_font.render("Use WASD or arrow keys to dodge!", True, WHITE)
-        instruction_rect = instruction_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 30))
+        instruction_text = render_text(self.small_font, "Use WASD or arrow keys to dodge!", True, WHITE)
+        instruction_rect = instruction_text.get_rect(center=view.point(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 30))
         self.screen.blit(instruction_text, instruction_rect)
     
     def draw_victory(self):
         """Draw victory screen"""
-        victory_text = self.font.render("VICTORY!", True, GREEN)
-        victory_rect = victory_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
+        victory_text = render_text(self.font, "VICTORY!", True, GREEN)
+        victory_rect = victory_text.get_rect(center=view.point(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
         self.screen.blit(victory_text, victory_rect)
         
         # Draw combat box
         pygame.draw.rect(self.screen, WHITE, 
-                        (COMBAT_BOX_X, COMBAT_BOX_Y, COMBAT_BOX_WIDTH, COMBAT_BOX_HEIGHT), 2)
+                        view.rect((COMBAT_BOX_X, COMBAT_BOX_Y, COMBAT_BOX_WIDTH, COMBAT_BOX_HEIGHT)), view.length(2))
     
-    def draw_message(self):
+    def draw_message(self, frame):
         """Draw current message"""
-        if self.message:
+        if frame.message:
             # Create a semi-transparent background
-            message_surface = pygame.Surface((SCREEN_WIDTH, 60))
+            message_surface = pygame.Surface(view.rect((0, 0, SCREEN_WIDTH, 60)).size)
             message_surface.set_alpha(180)
             message_surface.fill((50, 50, 50))
-            self.screen.blit(message_surface, (0, SCREEN_HEIGHT - 100))
+            dirty_rects.add(self.screen.blit(message_surface, view.point(0, SCREEN_HEIGHT - 100)))
             
             # Draw message text
-            message_text = self.font.render(self.message, True, WHITE)
-            message_rect = message_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 70))
+            message_text = render_text(self.font, frame.message, True, WHITE)
+            message_rect = message_text.get_rect(center=view.point(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 70))
             self.screen.blit(message_text, message_rect)
@@ -0,0 +1,284 @@
+"""
+Render-free combat state machine.
+CombatSim advances a fight by one tick per step() from an explicit input
+bitmask (see controls.py). It never touches the display, fonts or pygame's
+input state, so fights can run headless and faster than real time.
+"""
+
+import random
+from player import Player
+from enemy import Enemy, update_bullets
+from bullets import BulletWorld
+from attacks.timeline import compile_timeline
+from controls import *
+from settings import *
+
+class CombatSim:
+    def __init__(self, effects=None, seed=None, encounter=DEFAULT_ENCOUNTER):
+        # Particle manager for visual feedback, None when running headless
+        self.effects = effects
+        
+        # Every random choice the fight makes comes from this stream, so a
+        # seed plus the input for each tick reproduces the fight exactly
+        self.rng = random.Random()
+        self.seed_streams(seed)
+        
+        # Combat state
+        self.state = "player_turn"  # player_turn, turn_transition, enemy_turn, game_over, victory
+        self.player = Player(effects)
+        self.ticks = 0
+        
+        # Every enemy fires into this one world, so bullets are moved,
+        # collided and drawn once per frame however many enemies there are
+        self.bullets = BulletWorld()
+        self.build_encounter(encounter)
+        
+        # scenes.Preloader that compiles the next attack during the turn
+        # transition; None compiles it when the attack starts
+        self.preloader = None
+        self.waiting_for_attacks = False  # this tick held the transition open
+        
+        # UI state
+        self.message = ""
+        self.message_timer = 0
+        self.turn_transition_timer = 0
+    
+    def seed_streams(self, seed=None):
+        """Seed the fight's random streams, with a fresh seed if none is given"""
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.rng.seed(seed)
+        if self.effects is not None:
+            # Effects get a separate stream; they never feed back into the fight
+            self.effects.seed(f"{seed}:effects")
+    
+    def build_encounter(self, encounter):
+        """Create the enemies of one of the ENCOUNTERS, all sharing the bullet world"""
+        self.encounter = encounter
+        self.enemies = [Enemy(self.rng, self.bullets, name, max_hp, position)
+                        for name, max_hp, position in ENCOUNTERS[encounter]]
+        self.target = 0  # index of the enemy the player's actions apply to
+    
+    @property
+    def enemy(self):
+        """The targeted enemy"""
+        return self.enemies[self.target]
+    
+    def active_enemies(self):
+        """Enemies still in the fight"""
+        return [enemy for enemy in self.enemies if not enemy.defeated]
+    
+    def reset(self, seed=None, encounter=None):
+        """Reset combat for new fight, seeded with `seed` (random if None); keeps the encounter unless given"""
+        self.seed_streams(seed)
+        self.state = "player_turn"
+        self.player.reset()
+        self.bullets.clear()
+        self.build_encounter(encounter or self.encounter)
+        self.ticks = 0
+        self.message = ""
+        self.message_timer = 0
+        self.turn_transition_timer = 0
+    
+    @property
+    def finished(self):
+        """True once the fight has been won or lost"""
+        return self.state in ("victory", "game_over")
+    
+    def step(self, buttons=0, ticks=1):
+        """Advance the fight by one tick, or by `ticks` ticks of the same held input.
+        Longer steps are for fast headless runs; their collisions are swept, so
+        bullets can't skip past the soul between ticks"""
+        self.ticks += ticks
+        
+        # Menu navigation reacts to presses, not to held buttons
+        if self.state == "player_turn":
+            self.handle_menu_input(buttons >> PRESSED_SHIFT)
+        
+        # Update timers
+        self.message_timer = max(self.message_timer - ticks, 0)
+        self.turn_transition_timer = max(self.turn_transition_timer - ticks, 0)
+        
+        # Update player
+        self.player.update(ticks)
+        
+        # State machine
+        self.waiting_for_attacks = False
+        if self.state == "enemy_turn":
+            self.update_enemy_turn(buttons, ticks)
+        elif self.state == "turn_transition":
+            self.update_turn_transition(buttons)
+        
+        # Check win/lose conditions
+        if self.player.hp <= 0:
+            self.state = "game_over"
+        elif all(enemy.hp <= 0 for enemy in self.enemies):
+            self.state = "victory"
+            self.show_message("Victory! Enemy defeated!", 180)
+    
+    def handle_menu_input(self, pressed):
+        """Move the action cursor or confirm the selected action"""
+        if pressed & INPUT_LEFT and self.player.selected_action > 0:
+            self.player.selected_action -= 1
+        if pressed & INPUT_RIGHT and self.player.selected_action < len(self.player.actions) - 1:
+            self.player.selected_action += 1
+        if pressed & INPUT_UP:
+            self.select_target(-1)
+        if pressed & INPUT_DOWN:
+            self.select_target(1)
+        if pressed & INPUT_CONFIRM:
+            self.execute_player_action()
+    
+    def select_target(self, step):
+        """Move the target `step` places through the enemies still in the fight"""
+        for _ in range(len(self.enemies)):
+            self.target = (self.target + step) % len(self.enemies)
+            if not self.enemy.defeated:
+                return
+    
+    def add_effect(self, x, y, effect_type):
+        """Add a particle effect unless running headless"""
+        if self.effects is not None:
+            self.effects.add_effect(x, y, effect_type)
+    
+    def execute_player_action(self):
+        """Execute the selected player action"""
+        action = self.player.actions[self.player.selected_action]
+        target = self.enemy
+        
+        if action == "FIGHT":
+            damage = 15  # Base damage
+            # Add damage particle effect
+            self.add_effect(*target.position, "explosion")
+            if target.take_damage(damage):
+                if self.active_enemies():
+                    self.show_message(f"You dealt {damage} damage! {target.name} defeated!", 120)
+                    self.select_target(1)
+                    self.start_enemy_turn()
+                else:
+                    self.show_message(f"You dealt {damage} damage! Enemy defeated!", 120)
+                    self.state = "victory"
+            else:
+                self.show_message(f"You dealt {damage} damage!", 120)
+                self.start_enemy_turn()
+        
+        elif action == "ACT":
+            # Add star effect
+            self.add_effect(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, "stars")
+            self.show_message("You try to reason with the enemy...", 120)
+            self.start_enemy_turn()
+        
+        elif action == "ITEM":
+            heal_amount = 20
+            self.player.hp = min(self.player.max_hp, self.player.hp + heal_amount)
+            # Add healing particle effect
+            self.add_effect(self.player.rect.centerx, self.player.rect.centery, "heal")
+            self.show_message(f"You healed {heal_amount} HP!", 120)
+            self.start_enemy_turn()
+        
+        elif action == "MERCY":
+            if target.hp < target.max_hp * 0.3:  # Can only spare when enemy is low HP
+                target.spared = True
+                if self.active_enemies():
+                    self.show_message(f"{target.name} spared!", 120)
+                    self.select_target(1)
+                    self.start_enemy_turn()
+                else:
+                    self.show_message("Enemy spared! Victory!", 120)
+                    self.state = "victory"
+            else:
+                self.show_message("Enemy doesn't want mercy yet...", 120)
+                self.start_enemy_turn()
+    
+    def start_enemy_turn(self):
+        """Start enemy's attack phase"""
+        self.state = "turn_transition"
+        self.turn_transition_timer = 60  # 1 second transition
+        self.show_message("Enemy attacks!", 60)
+        
+        # Choose the attacks now so they can be compiled while the transition plays
+        for enemy in self.active_enemies():
+            pattern, variant = enemy.plan_attack()
+            if self.preloader is not None:
+                self.preloader.submit(("timeline", pattern.name, variant),
+                                      compile_timeline, pattern, ATTACK_DURATION, variant)
+    
+    def attack_keys(self):
+        """Preloader keys of the attacks the enemies planned"""
+        return [("timeline", enemy.planned_attack[0].name, enemy.planned_attack[1])
+                for enemy in self.active_enemies()]
+    
+    def attacks_compiling(self):
+        """True while any planned attack is still compiling on the preloader"""
+        return self.preloader is not None and any(self.preloader.pending(key) for key in self.attack_keys())
+    
+    def update_turn_transition(self, buttons=0):
+        """Handle transition between turns"""
+        if self.turn_transition_timer > 0:
+            return
+        
+        # An attack that is still compiling holds the transition open, with
+        # the timer at 0, rather than stalling the tick. The held ticks carry
+        # TRANSITION_WAIT in the recorded input, so replays hold on them too
+        if buttons & TRANSITION_WAIT or self.attacks_compiling():
+            self.waiting_for_attacks = True
+            return
+        
+        self.state = "enemy_turn"
+        self.bullets.clear()
+        timelines = {}
+        for enemy, key in zip(self.active_enemies(), self.attack_keys()):
+            timeline = None
+            if self.preloader is not None:
+                if key not in timelines:
+                    timelines[key] = self.preloader.take(key)
+                timeline = timelines[key]
+            enemy.start_attack(timeline)
+    
+    def update_enemy_turn(self, buttons, ticks=1):
+        """Handle enemy's turn (dodge phase)"""
+        # Player can move to dodge; longer steps sweep collisions from here
+        start = self.player.rect.copy() if ticks > 1 else None
+        self.player.handle_input_dodge(buttons, ticks)
+        
+        # Every enemy spawns into the shared world, which then moves and
+        # collides once, so the cost follows the bullet count alone
+        attackers = self.active_enemies()
+        for enemy in attackers:
+            enemy.update(ticks)
+        update_bullets(self.bullets, self.player, ticks=ticks, start=start)
+        
+        # Check if every attack is finished
+        if all(enemy.attack_finished for enemy in attackers):
+            self.state = "player_turn"
+            self.player.made_move = False
+            self.show_message("Your turn!", 60)
+    
+    def show_message(self, text, duration=120):
+        """Show a message for a specified duration"""
+        self.message = text
+        self.message_timer = duration
+    
+    def snapshot(self):
+        """The fight as it stands, copied for drawing on another thread"""
+        return CombatSnapshot(self)
+
+class CombatSnapshot:
+    """A fight frozen between ticks: everything Combat.draw reads, copied so
+    the fight can keep stepping on one thread while this is drawn on another"""
+    def __init__(self, sim):
+        self.state = sim.state
+        self.ticks = sim.ticks
+        self.player = sim.player.snapshot()
+        self.enemies = tuple(enemy.snapshot() for enemy in sim.enemies)
+        self.target = sim.target
+        self.bullets = sim.bullets.snapshot()
+        self.effects = sim.effects.snapshot() if sim.effects is not None else None
+        self.message = sim.message
+        self.message_timer = sim.message_timer
+    
+    @property
+    def enemy(self):
+        """The targeted enemy"""
+        return self.enemies[self.target]
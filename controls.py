@@ -0,0 +1,49 @@
+"""
+Input as plain bitmasks, so the combat simulation never has to touch
+pygame's event or key state. The low bits hold the buttons that are down
+this tick, the high bits the buttons that were newly pressed.
+"""
+
+import pygame
+
+INPUT_UP = 1
+INPUT_DOWN = 2
+INPUT_LEFT = 4
+INPUT_RIGHT = 8
+INPUT_CONFIRM = 16
+PRESSED_SHIFT = 5
+
+# Not a button: marks the ticks a turn transition spent waiting for its
+# attacks to compile, so a replay waits on exactly the same ticks
+TRANSITION_WAIT = 1 << (2 * PRESSED_SHIFT)
+
+# Keyboard bindings for every button
+KEY_BINDINGS = {
+    INPUT_UP: (pygame.K_UP, pygame.K_w),
+    INPUT_DOWN: (pygame.K_DOWN, pygame.K_s),
+    INPUT_LEFT: (pygame.K_LEFT, pygame.K_a),
+    INPUT_RIGHT: (pygame.K_RIGHT, pygame.K_d),
+    INPUT_CONFIRM: (pygame.K_z, pygame.K_RETURN),
+}
+
+# Keys that count as a press in menus (WASD only moves the soul)
+MENU_KEYS = {
+    pygame.K_UP: INPUT_UP,
+    pygame.K_DOWN: INPUT_DOWN,
+    pygame.K_LEFT: INPUT_LEFT,
+    pygame.K_RIGHT: INPUT_RIGHT,
+    pygame.K_z: INPUT_CONFIRM,
+    pygame.K_RETURN: INPUT_CONFIRM,
+}
+
+def held_buttons(keys):
+    """Bitmask of buttons held in a pygame.key.get_pressed() result"""
+    buttons = 0
+    for button, bound_keys in KEY_BINDINGS.items():
+        if any(keys[key] for key in bound_keys):
+            buttons |= button
+    return buttons
+
+def pressed_buttons(key):
+    """Pressed-button bits for a KEYDOWN key"""
+    return MENU_KEYS.get(key, 0) << PRESSED_SHIFT
@@ -0,0 +1,240 @@
+"""
+Monte Carlo difficulty analysis for attack patterns.
+Every pattern (the enemy's own and the advanced ones in
+attacks/bullet_patterns.py) is played through thousands of times against
+scripted dodging policies, spread over a process pool. For each pattern
+and policy it reports how often the player gets hit and the expected
+damage per attack, and it writes a danger heatmap of the combat box: the
+mean number of bullets in each cell per frame.
+
+    python difficulty.py --trials 2000 --seed 1
+    python difficulty.py --patterns rain spiral --policies greedy --jobs 4
+
+Trials are split into fixed-size chunks, each with its own seed derived
+from --seed, so results don't depend on how many workers ran them.
+"""
+
+import os
+import sys
+import json
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Workers never open a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+from settings import *
+from controls import *
+from player import Player
+from enemy import Enemy, ATTACK_PATTERNS, update_bullets
+from attacks.bullet_patterns import BulletPatterns
+from attacks.timeline import compile_timeline
+
+# Heatmap grid over the combat box
+GRID_COLUMNS = COMBAT_BOX_WIDTH // DANGER_CELL_SIZE
+GRID_ROWS = COMBAT_BOX_HEIGHT // DANGER_CELL_SIZE
+
+def all_patterns():
+    """Every pattern to analyze, the enemy's first"""
+    center = (COMBAT_BOX_X + COMBAT_BOX_WIDTH // 2, COMBAT_BOX_Y + COMBAT_BOX_HEIGHT // 2)
+    return list(ATTACK_PATTERNS) + BulletPatterns.patterns(*center)
+
+# --- Dodging policies: (player, bullets, rng) -> held buttons -----------
+
+def idle_policy(player, bullets, rng):
+    """Never move"""
+    return 0
+
+WALK_DIRECTIONS = (0, INPUT_UP, INPUT_DOWN, INPUT_LEFT, INPUT_RIGHT)
+
+def random_walk_policy(player, bullets, rng):
+    """Hold a random direction, switching to a new one every few ticks"""
+    if getattr(player, 'walk_ticks', 0) <= 0:
+        player.walk_direction = rng.choice(WALK_DIRECTIONS)
+        player.walk_ticks = rng.randint(5, 20)
+    player.walk_ticks -= 1
+    return player.walk_direction
+
+# Stand still or step in any of the eight directions
+EVADE_MOVES = np.array([0, INPUT_UP, INPUT_DOWN, INPUT_LEFT, INPUT_RIGHT,
+                        INPUT_UP | INPUT_LEFT, INPUT_UP | INPUT_RIGHT,
+                        INPUT_DOWN | INPUT_LEFT, INPUT_DOWN | INPUT_RIGHT])
+EVADE_DX = np.array([0, 0, 0, -1, 1, -1, 1, -1, 1]) * PLAYER_SPEED
+EVADE_DY = np.array([0, -1, 1, 0, 0, -1, -1, 1, 1]) * PLAYER_SPEED
+EVADE_RADIUS = 80  # only bullets this close are considered
+EVADE_CENTERING = 0.05  # pull towards the middle of the box, away from corners
+
+def greedy_evade_policy(player, bullets, rng):
+    """Take the step that leaves the player furthest from next tick's nearby bullets"""
+    cx, cy = player.rect.center
+    half = PLAYER_SIZE / 2
+    px = np.clip(cx + EVADE_DX, COMBAT_BOX_X + half, COMBAT_BOX_X + COMBAT_BOX_WIDTH - half)
+    py = np.clip(cy + EVADE_DY, COMBAT_BOX_Y + half, COMBAT_BOX_Y + COMBAT_BOX_HEIGHT - half)
+    
+    score = EVADE_CENTERING * (((px - (COMBAT_BOX_X + COMBAT_BOX_WIDTH / 2)) / COMBAT_BOX_WIDTH) ** 2 +
+                               ((py - (COMBAT_BOX_Y + COMBAT_BOX_HEIGHT / 2)) / COMBAT_BOX_HEIGHT) ** 2)
+    for group, nearby in bullets.query_radius(cx, cy, EVADE_RADIUS):
+        # Where the nearby bullets' centers will be after they move
+        half_size = group.size[nearby] / 2
+        bx = group.x[nearby] + half_size + group.vx[nearby]
+        by = group.y[nearby] + half_size + group.vy[nearby]
+        distance_sq = (px[:, None] - bx) ** 2 + (py[:, None] - by) ** 2
+        score = score + (1.0 / (distance_sq + 1.0)).sum(axis=1)
+    return int(EVADE_MOVES[np.argmin(score)])
+
+POLICIES = {
+    "idle": idle_policy,
+    "random": random_walk_policy,
+    "greedy": greedy_evade_policy,
+}
+
+# --- Trials -------------------------------------------------------------
+
+def run_attack(spec, policy, player, enemy, rng, danger):
+    """Play one attack of `spec` from a fresh player; returns (hits, damage taken)"""
+    player.reset()
+    player.walk_ticks = 0
+    enemy.reset()
+    bullets = enemy.bullets
+    timeline = compile_timeline(spec, ATTACK_DURATION, rng.randrange(spec.variants))
+    
+    hits = 0
+    cells = []
+    for frame in range(1, ATTACK_DURATION + 1):
+        # Same order as a combat tick: player timers, movement, then the attack
+        player.update()
+        player.handle_input_dodge(policy(player, bullets, rng))
+        timeline.emit(bullets, frame)
+        hp = player.hp
+        update_bullets(bullets, player)
+        hits += player.hp < hp
+        
+        # Count every bullet whose center is inside the box
+        left, top, size = bullets.rects()
+        column = (left + size // 2 - COMBAT_BOX_X) // DANGER_CELL_SIZE
+        row = (top + size // 2 - COMBAT_BOX_Y) // DANGER_CELL_SIZE
+        inside = (column >= 0) & (column < GRID_COLUMNS) & (row >= 0) & (row < GRID_ROWS)
+        cells.append(row[inside] * GRID_COLUMNS + column[inside])
+    
+    danger += np.bincount(np.concatenate(cells), minlength=GRID_ROWS * GRID_COLUMNS)
+    return hits, player.max_hp - player.hp
+
+def run_chunk(pattern_index, policy_name, trials, seed):
+    """Worker: play `trials` attacks of one pattern against one policy"""
+    spec = all_patterns()[pattern_index]
+    policy = POLICIES[policy_name]
+    rng = random.Random(seed)
+    player = Player()
+    enemy = Enemy(rng)
+    danger = np.zeros(GRID_ROWS * GRID_COLUMNS, dtype=np.int64)
+    
+    hit_trials = 0
+    total_hits = 0
+    total_damage = 0
+    for _ in range(trials):
+        hits, damage = run_attack(spec, policy, player, enemy, rng, danger)
+        hit_trials += hits > 0
+        total_hits += hits
+        total_damage += damage
+    return pattern_index, policy_name, trials, hit_trials, total_hits, total_damage, danger
+
+def chunk_seed(seed, pattern_index, policy_index, chunk):
+    """Independent seed for one chunk of trials"""
+    return int(np.random.SeedSequence([seed, pattern_index, policy_index, chunk]).generate_state(1)[0])
+
+def analyze(pattern_indices, policy_names, trials, seed, jobs, chunk_size):
+    """Run every (pattern, policy) pair `trials` times; returns stats and danger grids"""
+    tasks = []
+    for pattern_index in pattern_indices:
+        for policy_index, policy_name in enumerate(policy_names):
+            for chunk, start in enumerate(range(0, trials, chunk_size)):
+                tasks.append((pattern_index, policy_name, min(chunk_size, trials - start),
+                              chunk_seed(seed, pattern_index, policy_index, chunk)))
+    
+    stats = {}
+    danger = {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(run_chunk, *task) for task in tasks]
+        for future in futures:
+            pattern_index, policy_name, runs, hit_trials, hits, damage, grid = future.result()
+            entry = stats.setdefault((pattern_index, policy_name), [0, 0, 0, 0])
+            entry[0] += runs
+            entry[1] += hit_trials
+            entry[2] += hits
+            entry[3] += damage
+            if pattern_index in danger:
+                danger[pattern_index] += grid
+            else:
+                danger[pattern_index] = grid
+    return stats, danger
+
+# --- Output -------------------------------------------------------------
+
+def save_heatmap_png(grid, path, scale=DANGER_CELL_SIZE):
+    """Save a heatmap as a black-red-yellow PNG, one block of pixels per cell"""
+    peak = grid.max()
+    level = grid / peak if peak > 0 else grid
+    colors = np.zeros(grid.shape + (3,), dtype=np.uint8)
+    colors[..., 0] = np.minimum(level * 2, 1) * 255
+    colors[..., 1] = np.clip(level * 2 - 1, 0, 1) * 255
+    pixels = np.repeat(np.repeat(colors, scale, axis=0), scale, axis=1)
+    # surfarray indexes pixels as (x, y)
+    pygame.image.save(pygame.surfarray.make_surface(pixels.transpose(1, 0, 2)), path)
+
+def main():
+    patterns = all_patterns()
+    names = [spec.name for spec in patterns]
+    parser = argparse.ArgumentParser(description="Monte Carlo difficulty analysis for attack patterns")
+    parser.add_argument("--trials", type=int, default=1000, help="attacks per pattern and policy")
+    parser.add_argument("--patterns", nargs="+", choices=names, default=names, help="patterns to analyze")
+    parser.add_argument("--policies", nargs="+", choices=sorted(POLICIES), default=list(POLICIES),
+                        help="dodging policies to play with")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=50, help="trials per worker task")
+    parser.add_argument("--seed", type=int, default=0, help="base seed for every chunk")
+    parser.add_argument("--out", default="difficulty_report", help="directory for heatmaps and summary")
+    args = parser.parse_args()
+    
+    pattern_indices = [names.index(name) for name in args.patterns]
+    start = time.perf_counter()
+    stats, danger = analyze(pattern_indices, args.policies, args.trials, args.seed,
+                            args.jobs, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    
+    os.makedirs(args.out, exist_ok=True)
+    summary = {}
+    print(f"{'pattern':18s} {'policy':8s} {'hit %':>7s} {'E[damage]':>10s} {'E[hits]':>8s}")
+    for pattern_index in pattern_indices:
+        name = names[pattern_index]
+        summary[name] = {}
+        for policy_name in args.policies:
+            runs, hit_trials, hits, damage = stats[(pattern_index, policy_name)]
+            summary[name][policy_name] = {
+                "trials": runs,
+                "hit_probability": hit_trials / runs,
+                "expected_damage": damage / runs,
+                "expected_hits": hits / runs,
+            }
+            print(f"{name:18s} {policy_name:8s} {100 * hit_trials / runs:6.1f}% "
+                  f"{damage / runs:10.2f} {hits / runs:8.2f}")
+        
+        # Mean bullets per cell per frame, over every policy's runs
+        frames = args.trials * len(args.policies) * ATTACK_DURATION
+        grid = danger[pattern_index].reshape(GRID_ROWS, GRID_COLUMNS) / frames
+        np.save(os.path.join(args.out, f"danger_{name}.npy"), grid)
+        save_heatmap_png(grid, os.path.join(args.out, f"danger_{name}.png"))
+    
+    with open(os.path.join(args.out, "summary.json"), "w") as summary_file:
+        json.dump(summary, summary_file, indent=2)
+    
+    attacks = args.trials * len(args.policies) * len(pattern_indices)
+    print(f"{attacks} attacks in {elapsed:.2f}s on {args.jobs} workers "
+          f"({attacks / elapsed:.0f} attacks/s, {attacks * ATTACK_DURATION / elapsed:.0f} ticks/s)",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
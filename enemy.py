@@ -1,228 +1,287 @@
-import pygame
+import copy
 import random
 import math
+import numpy as np
+from itertools import repeat
 from settings import *
+from text_cache import render_text
 from sprites import get_sprite_manager
+from collision import get_heart_contacts
+from bullets import BulletWorld
+from attacks.timeline import PatternSpec, compile_timeline
+from render import dirty_rects, view
 
 class Enemy:
-    def __init__(self):
-        self.name = "Test Enemy"
-        self.hp = 50
-        self.max_hp = 50
+    def __init__(self, rng=None, bullets=None, name="Test Enemy", max_hp=50,
+                 position=(SCREEN_WIDTH - 150, 80)):
+        # Random stream for attack choices; the fight owns and seeds it
+        self.rng = rng if rng is not None else random.Random()
+        self.name = name
+        self.hp = max_hp
+        self.max_hp = max_hp
+        self.spared = False
+        self.position = position  # sprite center; name and HP are drawn above it
         
-        # Attack system
-        self.bullets = []
+        # Attack system; enemies fighting together share one bullet world
+        self.bullets = bullets if bullets is not None else BulletWorld()
         self.attack_finished = False
         self.attack_timer = 0
         self.current_attack = 0
-        self.attack_patterns = [
-            self.rain_attack,
-            self.spiral_attack,
-            self.cross_attack,
-            self.random_scatter
-        ]
-        
-        # Sprite manager
-        self.sprite_manager = get_sprite_manager()
-        
+        self.attack_patterns = ATTACK_PATTERNS
+        self.timeline = None
+        self.planned_attack = None  # (pattern, variant) chosen ahead of start_attack
+    
+    @property
+    def sprite_manager(self):
+        """Sprite manager, created on first draw so headless fights never build sprites"""
+        return get_sprite_manager()
+    
     def reset(self):
         """Reset enemy for new combat"""
         self.hp = self.max_hp
+        self.spared = False
         self.bullets.clear()
         self.attack_finished = False
         self.attack_timer = 0
         self.current_attack = 0
+        self.timeline = None
+        self.planned_attack = None
     
-    def start_attack(self):
-        """Start a new attack pattern"""
-        self.bullets.clear()
-        self.attack_finished = False
-        self.attack_timer = 0
+    def plan_attack(self):
+        """Choose the next attack ahead of time, so it can be prepared; returns (pattern, variant)"""
         # Cycle through attack patterns or choose random
-        self.current_attack = random.randint(0, len(self.attack_patterns) - 1)
+        self.current_attack = self.rng.randint(0, len(self.attack_patterns) - 1)
         
-    def update(self, player):
-        """Update enemy and attack logic"""
+        # Random patterns come in a few seeded variants, compiled once each
+        pattern = self.attack_patterns[self.current_attack]
+        self.planned_attack = (pattern, self.rng.randrange(pattern.variants))
+        return self.planned_attack
+    
+    @property
+    def defeated(self):
+        """True once the enemy is out of the fight, beaten or spared"""
+        return self.hp <= 0 or self.spared
+    
+    def start_attack(self, timeline=None):
+        """Start the planned attack (planning one now if needed), with its timeline if already compiled"""
+        self.attack_finished = False
+        self.attack_timer = 0
+        if self.planned_attack is None:
+            self.plan_attack()
+        pattern, variant = self.planned_attack
+        self.planned_attack = None
+        if timeline is None:
+            timeline = compile_timeline(pattern, ATTACK_DURATION, variant)
+        self.timeline = timeline
+    
+    def update(self, ticks=1):
+        """Advance the attack `ticks` frames, spawning the bullets it has due"""
         if not self.attack_finished:
-            self.attack_timer += 1
-            
-            # Execute current attack pattern
-            if self.current_attack < len(self.attack_patterns):
-                self.attack_patterns[self.current_attack]()
+            first_frame = self.attack_timer + 1
+            self.attack_timer = min(self.attack_timer + ticks, ATTACK_DURATION)
             
-            # Update bullets
-            self.update_bullets(player)
+            # Bullets are moved and collided by update_bullets, once for
+            # every enemy sharing the world
+            if self.timeline is not None:
+                self.timeline.emit(self.bullets, first_frame, self.attack_timer)
             
             # End attack after duration
             if self.attack_timer >= ATTACK_DURATION:
                 self.attack_finished = True
     
-    def update_bullets(self, player):
-        """Update all bullets and check collisions"""
-        for bullet in self.bullets[:]:  # Copy list to avoid modification issues
-            # Update bullet position
-            bullet['x'] += bullet['vx']
-            bullet['y'] += bullet['vy']
-            bullet['rect'].x = int(bullet['x'])
-            bullet['rect'].y = int(bullet['y'])
-            
-            # Remove bullets that are off screen
-            if (bullet['rect'].right < 0 or bullet['rect'].left > SCREEN_WIDTH or
-                bullet['rect'].bottom < 0 or bullet['rect'].top > SCREEN_HEIGHT):
-                self.bullets.remove(bullet)
-                continue
-            
-            # Check collision with player
-            if bullet['rect'].colliderect(player.rect):
-                if player.take_damage(bullet.get('damage', 10)):
-                    # Remove bullet on hit (optional)
-                    if bullet in self.bullets:
-                        self.bullets.remove(bullet)
-    
-    def rain_attack(self):
+    @staticmethod
+    def rain_attack(frames, rng):
         """Bullets fall from the top like rain"""
-        if self.attack_timer % 15 == 0:  # Spawn every 15 frames
-            x = random.randint(COMBAT_BOX_X, COMBAT_BOX_X + COMBAT_BOX_WIDTH - BULLET_SIZE)
-            y = COMBAT_BOX_Y - BULLET_SIZE
-            bullet = {
-                'rect': pygame.Rect(x, y, BULLET_SIZE, BULLET_SIZE),
-                'x': float(x),
-                'y': float(y),
-                'vx': 0,
-                'vy': random.uniform(2, 4),
-                'color': YELLOW,
-                'damage': 10,
-                'sprite_type': 'circle'
-            }
-            self.bullets.append(bullet)
-    
-    def spiral_attack(self):
+        return {
+            'x': rng.integers(COMBAT_BOX_X, COMBAT_BOX_X + COMBAT_BOX_WIDTH - BULLET_SIZE,
+                              frames.shape, endpoint=True),
+            'y': COMBAT_BOX_Y - BULLET_SIZE,
+            'vy': rng.uniform(2, 4, frames.shape),
+            'sprite_type': 'circle'
+        }
+    
+    @staticmethod
+    def spiral_attack(frames, rng):
         """Bullets spiral outward from center"""
-        if self.attack_timer % 8 == 0:
-            center_x = COMBAT_BOX_X + COMBAT_BOX_WIDTH // 2
-            center_y = COMBAT_BOX_Y + COMBAT_BOX_HEIGHT // 2
-            
-            angle = (self.attack_timer * 0.2) % (2 * math.pi)
-            speed = 3
-            
-            bullet = {
-                'rect': pygame.Rect(center_x, center_y, BULLET_SIZE, BULLET_SIZE),
-                'x': float(center_x),
-                'y': float(center_y),
-                'vx': math.cos(angle) * speed,
-                'vy': math.sin(angle) * speed,
-                'color': BLUE,
-                'damage': 10,
-                'sprite_type': 'diamond'
-            }
-            self.bullets.append(bullet)
-    
-    def cross_attack(self):
+        angle = (frames * 0.2) % (2 * math.pi)
+        speed = 3
+        return {
+            'x': COMBAT_BOX_X + COMBAT_BOX_WIDTH // 2,
+            'y': COMBAT_BOX_Y + COMBAT_BOX_HEIGHT // 2,
+            'vx': np.cos(angle) * speed,
+            'vy': np.sin(angle) * speed,
+            'sprite_type': 'diamond'
+        }
+    
+    @staticmethod
+    def cross_attack(frames, rng):
         """Bullets move in cross pattern"""
-        if self.attack_timer % 20 == 0:
-            center_x = COMBAT_BOX_X + COMBAT_BOX_WIDTH // 2
-            center_y = COMBAT_BOX_Y + COMBAT_BOX_HEIGHT // 2
-            speed = 3
-            
-            # Four directions
-            directions = [(0, -1), (1, 0), (0, 1), (-1, 0)]  # Up, Right, Down, Left
-            
-            for dx, dy in directions:
-                bullet = {
-                    'rect': pygame.Rect(center_x, center_y, BULLET_SIZE, BULLET_SIZE),
-                    'x': float(center_x),
-                    'y': float(center_y),
-                    'vx': dx * speed,
-                    'vy': dy * speed,
-                    'color': ORANGE,
-                    'damage': 10,
-                    'sprite_type': 'star'
-                }
-                self.bullets.append(bullet)
-    
-    def random_scatter(self):
+        speed = 3
+        # Four directions: Up, Right, Down, Left
+        return {
+            'x': COMBAT_BOX_X + COMBAT_BOX_WIDTH // 2,
+            'y': COMBAT_BOX_Y + COMBAT_BOX_HEIGHT // 2,
+            'vx': np.array([0, 1, 0, -1]) * speed,
+            'vy': np.array([-1, 0, 1, 0]) * speed,
+            'sprite_type': 'star'
+        }
+    
+    @staticmethod
+    def random_scatter(frames, rng):
         """Random bullets from random positions"""
-        if self.attack_timer % 12 == 0:
-            # Random spawn position around the edges
-            side = random.randint(0, 3)
-            if side == 0:  # Top
-                x = random.randint(COMBAT_BOX_X, COMBAT_BOX_X + COMBAT_BOX_WIDTH)
-                y = COMBAT_BOX_Y - BULLET_SIZE
-            elif side == 1:  # Right
-                x = COMBAT_BOX_X + COMBAT_BOX_WIDTH
-                y = random.randint(COMBAT_BOX_Y, COMBAT_BOX_Y + COMBAT_BOX_HEIGHT)
-            elif side == 2:  # Bottom
-                x = random.randint(COMBAT_BOX_X, COMBAT_BOX_X + COMBAT_BOX_WIDTH)
-                y = COMBAT_BOX_Y + COMBAT_BOX_HEIGHT
-            else:  # Left
-                x = COMBAT_BOX_X - BULLET_SIZE
-                y = random.randint(COMBAT_BOX_Y, COMBAT_BOX_Y + COMBAT_BOX_HEIGHT)
-            
-            # Aim roughly towards player area
-            target_x = COMBAT_BOX_X + COMBAT_BOX_WIDTH // 2
-            target_y = COMBAT_BOX_Y + COMBAT_BOX_HEIGHT // 2
-            
-            dx = target_x - x
-            dy = target_y - y
-            distance = math.sqrt(dx*dx + dy*dy)
-            
-            if distance > 0:
-                speed = 2.5
-                vx = (dx / distance) * speed
-                vy = (dy / distance) * speed
-            else:
-                vx, vy = 0, 0
-            
-            bullet = {
-                'rect': pygame.Rect(x, y, BULLET_SIZE, BULLET_SIZE),
-                'x': float(x),
-                'y': float(y),
-                'vx': vx,
-                'vy': vy,
-                'color': PURPLE,
-                'damage': 10,
-                'sprite_type': 'square'
-            }
-            self.bullets.append(bullet)
+        # Random spawn position around the edges: top, right, bottom, left
+        side = rng.integers(0, 3, frames.shape, endpoint=True)
+        along_x = rng.integers(COMBAT_BOX_X, COMBAT_BOX_X + COMBAT_BOX_WIDTH, frames.shape, endpoint=True)
+        along_y = rng.integers(COMBAT_BOX_Y, COMBAT_BOX_Y + COMBAT_BOX_HEIGHT, frames.shape, endpoint=True)
+        x = np.choose(side, [along_x, COMBAT_BOX_X + COMBAT_BOX_WIDTH, along_x, COMBAT_BOX_X - BULLET_SIZE])
+        y = np.choose(side, [COMBAT_BOX_Y - BULLET_SIZE, along_y, COMBAT_BOX_Y + COMBAT_BOX_HEIGHT, along_y])
+        
+        # Aim roughly towards player area
+        target_x = COMBAT_BOX_X + COMBAT_BOX_WIDTH // 2
+        target_y = COMBAT_BOX_Y + COMBAT_BOX_HEIGHT // 2
+        
+        dx = target_x - x
+        dy = target_y - y
+        distance = np.hypot(dx, dy)
+        
+        speed = 2.5
+        scale = np.divide(speed, distance, out=np.zeros(distance.shape), where=distance > 0)
+        return {
+            'x': x,
+            'y': y,
+            'vx': dx * scale,
+            'vy': dy * scale,
+            'sprite_type': 'square'
+        }
     
     def take_damage(self, damage):
         """Take damage and return True if defeated"""
         self.hp -= damage
         return self.hp <= 0
     
-    def draw(self, screen, font):
-        """Draw enemy info and bullets"""
-        # Draw enemy sprite
+    def snapshot(self):
+        """A copy for drawing while the fight keeps changing this enemy"""
+        frozen = copy.copy(self)
+        # Drop what the fight keeps mutating; drawing never reads it
+        frozen.rng = None
+        frozen.bullets = None
+        frozen.timeline = None
+        return frozen
+    
+    def draw(self, screen, font, targeted=False):
+        """Draw the enemy sprite, name and HP; the targeted enemy's name is highlighted"""
+        enemy_x, enemy_y = self.position
         enemy_sprite = self.sprite_manager.get_sprite('enemy_basic')
         if enemy_sprite:
-            # Position enemy sprite in top right area
-            enemy_x = SCREEN_WIDTH - 150
-            enemy_y = 80
-            sprite_rect = enemy_sprite.get_rect(center=(enemy_x, enemy_y))
+            sprite_rect = enemy_sprite.get_rect(center=view.point(enemy_x, enemy_y))
             screen.blit(enemy_sprite, sprite_rect)
         
         # Draw enemy name and HP
-        name_text = font.render(self.name, True, WHITE)
-        screen.blit(name_text, (SCREEN_WIDTH - 200, 20))
-        
-        hp_text = font.render(f"HP: {self.hp}/{self.max_hp}", True, WHITE)
-        screen.blit(hp_text, (SCREEN_WIDTH - 200, 50))
+        name_text = render_text(font, self.name, True, YELLOW if targeted else WHITE)
+        dirty_rects.add(screen.blit(name_text, view.point(enemy_x - 50, 20)))
         
-        # Draw combat box
-        pygame.draw.rect(screen, WHITE, 
-                        (COMBAT_BOX_X, COMBAT_BOX_Y, COMBAT_BOX_WIDTH, COMBAT_BOX_HEIGHT), 2)
-        
-        # Draw bullets
-        for bullet in self.bullets:
-            # Try to draw sprite first, fallback to colored rectangle
-            sprite_type = bullet.get('sprite_type', 'circle')
-            sprite = self.sprite_manager.get_bullet_sprite(sprite_type)
-            
-            if sprite:
-                # Center the sprite on the bullet rectangle
-                sprite_rect = sprite.get_rect(center=bullet['rect'].center)
-                screen.blit(sprite, sprite_rect)
-            else:
-                # Fallback to colored rectangle
-                pygame.draw.rect(screen, bullet['color'], bullet['rect'])
-                pygame.draw.rect(screen, WHITE, bullet['rect'], 1)
+        hp_text = render_text(font, "Spared" if self.spared else f"HP: {self.hp}/{self.max_hp}", True, WHITE)
+        dirty_rects.add(screen.blit(hp_text, view.point(enemy_x - 50, 50)))
+
+def update_bullets(bullets, player, pixel_perfect=PIXEL_PERFECT_COLLISION, ticks=1, start=None):
+    """Move every bullet in a world `ticks` ticks, then check collisions with the player.
+    For longer steps, `start` is the player's rect before it moved, and the
+    collision test is swept along both paths so nothing passes through the soul"""
+    bullets.target = player.rect  # homing bullets steer towards the player
+    bullets.update(ticks)
+    
+    # Check collision with player; only the first hit can land, since
+    # taking damage makes the player invincible, and none can while it is
+    if player.invincible:
+        return
+    if ticks > 1 and start is not None:
+        hit = first_swept_hit(bullets, start, player.rect, pixel_perfect)
+    else:
+        hit = first_hit(bullets, player.rect, pixel_perfect)
+    if hit is not None:
+        group, index = hit
+        if player.take_damage(int(group.damage[index])):
+            # Remove bullet on hit (optional)
+            group.kill(index)
+
+def first_hit(bullets, rect, pixel_perfect):
+    """(group, index) of the oldest bullet touching the soul at `rect`, or None"""
+    hits = bullets.collide_rect(rect)
+    if not pixel_perfect:
+        return hits[0] if hits else None
+    
+    # The rects overlap, which is all the broadphase knows; with
+    # pixel-perfect collision the sprite masks must touch too. item()
+    # reads plain ints, much cheaper than indexing out numpy scalars
+    touches = get_heart_contacts().bullet_touches_heart
+    center_x, center_y = rect.center
+    for group, index in hits:
+        half_size = int(group.size.item(index)) // 2
+        dx = int(group.x.item(index)) + half_size - center_x
+        dy = int(group.y.item(index)) + half_size - center_y
+        if touches(group.sprite.item(index), dx, dy):
+            return group, index
+    return None
+
+def first_swept_hit(bullets, start, end, pixel_perfect):
+    """(group, index) of the bullet that touched the soul earliest while it moved from `start` to `end`"""
+    hits = bullets.sweep_rect(start, end)
+    if not pixel_perfect:
+        return hits[0][:2] if hits else None
+    
+    # Walk each rect overlap a pixel of relative motion at a time until the
+    # masks touch; hits come by entry time, so stop once none can be earlier
+    contacts = get_heart_contacts()
+    best = None
+    for group, index, enter, leave in hits:
+        if best is not None and enter >= best[0]:
+            break
+        half_size = int(group.size[index]) // 2
+        # A bullet spawned partway through the step sits at prev_x until `born`
+        born = float(group.spawn_times(index))
+        prev_x, prev_y = float(group.prev_x[index]), float(group.prev_y[index])
+        move_x = (float(group.x[index]) - prev_x) / (1 - born)
+        move_y = (float(group.y[index]) - prev_y) / (1 - born)
+        samples = max(1, int(np.ceil(max(abs(move_x - (end.x - start.x)),
+                                          abs(move_y - (end.y - start.y))) * (leave - enter))))
+        for t in np.linspace(enter, leave, samples + 1).tolist():
+            dx = int(prev_x + move_x * (t - born)) + half_size - round(start.centerx + (end.centerx - start.centerx) * t)
+            dy = int(prev_y + move_y * (t - born)) + half_size - round(start.centery + (end.centery - start.centery) * t)
+            if contacts.bullet_touches_heart(int(group.sprite[index]), dx, dy):
+                if best is None or t < best[0]:
+                    best = (t, group, index)
+                break
+    return best[1:] if best is not None else None
+
+def draw_bullets(screen, bullets, alpha=1.0):
+    """Blit every bullet in a world from the sprite atlas in one batch"""
+    if not len(bullets):
+        return
+    sprite_manager = get_sprite_manager()
+    atlas = sprite_manager.bullet_atlas
+    areas = sprite_manager.bullet_areas
+    half_widths = sprite_manager.bullet_half_widths
+    half_heights = sprite_manager.bullet_half_heights
+    
+    # Center each sprite on its bullet rectangle, mapped onto the render target
+    left, top, size = bullets.draw_rects(alpha)
+    kinds = bullets.sprites()
+    dest_x = (left + size // 2) // view.divisor - half_widths[kinds]
+    dest_y = (top + size // 2) // view.divisor - half_heights[kinds]
+    screen.blits(zip(repeat(atlas), zip(dest_x.tolist(), dest_y.tolist()),
+                     map(areas.__getitem__, kinds.tolist())), False)
+    
+    # Report the bounding box of every bullet sprite
+    reach_x = 2 * half_widths.max() + 1
+    reach_y = 2 * half_heights.max() + 1
+    left = int(dest_x.min())
+    top = int(dest_y.min())
+    dirty_rects.add((left, top, int(dest_x.max()) + reach_x - left, int(dest_y.max()) + reach_y - top))
+
+# Enemy attacks, compiled into spawn timelines on first use
+ATTACK_PATTERNS = [
+    PatternSpec('rain', 15, Enemy.rain_attack, variants=TIMELINE_VARIANTS),
+    PatternSpec('spiral', 8, Enemy.spiral_attack),
+    PatternSpec('cross', 20, Enemy.cross_attack, count=4),
+    PatternSpec('random_scatter', 12, Enemy.random_scatter, variants=TIMELINE_VARIANTS),
+]
@@ -1,35 +1,92 @@
-import pygame
+import os
+import time
 import sys
-from combat import Combat
+
+# Installed before the game's own imports so they can be timed
+startup_profiler = None
+if "--profile-startup" in sys.argv:
+    from startup import StartupProfiler
+    startup_profiler = StartupProfiler(time.perf_counter())
+    startup_profiler.install()
+
+import pygame
+import argparse
 from menu import MainMenu
 from settings import *
+from text_cache import render_text
+from render import dirty_rects, view, create_display, UPSCALE_MODES
+from replay import ReplayRecorder
+from profiler import profiler
+from particles import particle_manager
+from scenes import SceneManager, preloader
+from pipeline import FramePipeline
+from telemetry import TelemetrySink
 
 class Game:
-    def __init__(self):
+    def __init__(self, record_dir=None, seed=None, encounter=DEFAULT_ENCOUNTER,
+                 scale=RENDER_SCALE, upscale=RENDER_UPSCALE, pipelined=PIPELINED_SIM,
+                 telemetry_dir=None):
         pygame.init()
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        # Every scene draws into this target, `scale` times smaller than the
+        # SCREEN_WIDTH x SCREEN_HEIGHT window it is upscaled to when presented
+        self.screen = create_display(scale, upscale)
         pygame.display.set_caption("Undertale-Style Combat Game")
         self.clock = pygame.time.Clock()
         
-        # Initialize fonts
-        self.font = pygame.font.Font(None, UI_FONT_SIZE)
-        self.small_font = pygame.font.Font(None, SMALL_FONT_SIZE)
+        # Initialize fonts, sized for the render target
+        self.font = pygame.font.Font(None, view.length(UI_FONT_SIZE))
+        self.small_font = pygame.font.Font(None, view.length(SMALL_FONT_SIZE))
         
-        # Game state
+        # Game state; the combat scene is built when the first fight starts
         self.state = "menu"  # menu, combat, game_over
         self.menu = MainMenu(self.screen, self.font, self.small_font)
-        self.combat = Combat(self.screen, self.font, self.small_font)
+        self.combat_scene = None
+        self.drawn_state = None  # state drawn last frame
         
+        # Switching to combat waits for its assets, prepared in the background
+        self.scenes = SceneManager(preloader)
+        
+        # Steps fights on a worker thread while frames are drawn, or None
+        # to update and draw in turn
+        self.pipeline = FramePipeline() if pipelined else None
+        
+        # Per-frame records written to telemetry_dir in the background, or None
+        self.telemetry = TelemetrySink(telemetry_dir) if telemetry_dir else None
+        
+        # Replay recording: the directory each fight is saved to, one file
+        # per fight, and the seed and encounter to fight with
+        self.record_dir = record_dir
+        self.record_session = time.strftime('%Y%m%d_%H%M%S')
+        self.fights_recorded = 0
+        self.seed = seed
+        self.encounter = encounter
+    
+    @property
+    def combat(self):
+        """The combat scene, built on first use and reused for every fight"""
+        if self.combat_scene is None:
+            from combat import Combat
+            self.combat_scene = Combat(self.screen, self.font, self.small_font, encounter=self.encounter)
+        return self.combat_scene
+    
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return False
             
+            # Profiler keys work in every state
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle()
+                continue
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                self.dump_profile()
+                continue
+            
             if self.state == "menu":
                 result = self.menu.handle_input(event)
-                if result == "start_game":
-                    self.state = "combat"
-                    self.combat.reset()
+                if result == "start_game" and not self.scenes.transitioning:
+                    # The menu keeps running until the fight's assets are ready
+                    self.scenes.switch("combat", prepare=self.preload_combat, commit=self.start_fight)
                 elif result == "quit":
                     return False
             
@@ -44,51 +101,181 @@ class Game:
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_r:
                         self.state = "menu"
-                        self.menu = MainMenu(self.screen, self.font, self.small_font)
+                        self.menu.reset()
                     elif event.key == pygame.K_ESCAPE:
                         return False
-                        
+        
         return True
     
+    def preload_combat(self):
+        """Worker thread: build the sprites and timelines fights need"""
+        from combat import preload_assets
+        preload_assets()
+    
+    def start_fight(self, prepared=None):
+        """Enter combat with a fresh fight, once its assets are ready"""
+        self.state = "combat"
+        if self.pipeline is not None:
+            self.pipeline.clear()
+        self.combat.reset(self.seed, self.encounter)
+        if self.record_dir:
+            self.combat.recorder = ReplayRecorder(self.combat.seed, self.combat.encounter)
+    
     def update(self):
+        self.scenes.update()
         if self.state == "menu":
             self.menu.update()
         elif self.state == "combat":
             self.combat.update()
+            if self.combat.finished:
+                self.save_replay()
     
-    def draw(self):
-        self.screen.fill(BLACK)
-        
-        if self.state == "menu":
-            self.menu.draw()
-        elif self.state == "combat":
-            self.combat.draw()
-        elif self.state == "game_over":
-            self.draw_game_over()
+    def save_replay(self):
+        """Write the current fight's replay, if one is being recorded, to a file of its own"""
+        if self.combat_scene is not None and self.combat.recorder is not None:
+            self.fights_recorded += 1
+            name = f"fight_{self.record_session}_{self.fights_recorded:03d}_seed{self.combat.seed}.replay"
+            os.makedirs(self.record_dir, exist_ok=True)
+            self.combat.recorder.save(os.path.join(self.record_dir, name), self.combat)
+            self.combat.recorder = None
+    
+    def dump_profile(self):
+        """Write the profiler's buffered frames to a CSV file"""
+        if not profiler.recorded:
+            print("Profiler is off; press F3 to start recording")
+            return
+        path = f"profile_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+        frames = profiler.dump_csv(path)
+        print(f"Wrote {frames} frames to {path}")
+    
+    def record_telemetry(self, frame_ms):
+        """Queue this frame's telemetry record"""
+        if self.state != "menu" and self.combat_scene is not None:
+            combat = self.combat
+            self.telemetry.record(frame_ms, len(combat.bullets), particle_manager.particle_count(),
+                                  combat.player.hp, combat.player.hits, combat.enemy.current_attack,
+                                  combat.state)
+        else:
+            self.telemetry.record(frame_ms, 0, particle_manager.particle_count(), 0, 0, -1, "menu")
+    
+    def draw(self, alpha=1.0):
+        """Draw a frame `alpha` of the way between the last two simulation ticks"""
+        with profiler.span("draw"):
+            self.screen.fill(BLACK)
             
-        pygame.display.flip()
+            # A new scene, or the menu's full-screen starfield, needs a full flip
+            if self.state != self.drawn_state or self.state == "menu":
+                dirty_rects.invalidate()
+                self.drawn_state = self.state
+            
+            if self.state == "menu":
+                self.menu.draw()
+            elif self.state == "combat":
+                # Pipelined fights are drawn from the worker's last snapshot
+                frame = self.pipeline.frame if self.pipeline is not None else None
+                self.combat.draw(alpha, frame)
+            elif self.state == "game_over":
+                self.draw_game_over()
+            
+            profiler.draw(self.screen, self.small_font)
+        
+        with profiler.span("present"):
+            dirty_rects.present()
     
     def draw_game_over(self):
-        game_over_text = self.font.render("GAME OVER", True, RED)
-        restart_text = self.small_font.render("Press R to restart or ESC to quit", True, WHITE)
+        game_over_text = render_text(self.font, "GAME OVER", True, RED)
+        restart_text = render_text(self.small_font, "Press R to restart or ESC to quit", True, WHITE)
         
-        game_over_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
-        restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50))
+        game_over_rect = game_over_text.get_rect(center=view.point(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
+        restart_rect = restart_text.get_rect(center=view.point(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50))
         
         self.screen.blit(game_over_text, game_over_rect)
         self.screen.blit(restart_text, restart_rect)
     
     def run(self):
         running = True
+        tick_length = 1.0 / SIM_RATE
+        accumulator = 0.0
+        previous_time = time.perf_counter()
         while running:
-            running = self.handle_events()
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
+            # Bank the real time that passed, but never more than the catch-up
+            # limit, so a long stall can't snowball into ever longer frames
+            now = time.perf_counter()
+            accumulator = min(accumulator + now - previous_time, tick_length * MAX_TICKS_PER_FRAME)
+            previous_time = now
+            
+            with profiler.span("events"):
+                running = self.handle_events()
+            
+            # Run as many fixed-length ticks as the banked time allows
+            ticks = 0
+            while accumulator >= tick_length:
+                ticks += 1
+                accumulator -= tick_length
+            pipelined = self.pipeline is not None and self.state == "combat"
+            if pipelined:
+                # The worker owns the fight from here until wait()
+                self.pipeline.submit(self.combat, [self.combat.poll_buttons() for _ in range(ticks)])
+            else:
+                with profiler.span("update"):
+                    for _ in range(ticks):
+                        self.update()
+            
+            # Render between the last two ticks, by how far into the next tick we are
+            self.draw(accumulator / tick_length)
+            if pipelined:
+                with profiler.span("sync"):
+                    self.pipeline.wait()
+                if self.combat.finished:
+                    self.save_replay()
+            if startup_profiler is not None:
+                startup_profiler.mark("first frame presented")
+                startup_profiler.uninstall()
+                pygame.quit()
+                sys.exit(0 if startup_profiler.report(STARTUP_BUDGET_MS) else 1)
+            with profiler.span("wait"):
+                self.clock.tick(FPS)
+            
+            if profiler.enabled:
+                bullets = len(self.combat.bullets) if self.state == "combat" else 0
+                profiler.end_frame(bullets, particle_manager.particle_count())
+            if self.telemetry is not None:
+                self.record_telemetry((time.perf_counter() - now) * 1000)
         
+        if self.pipeline is not None:
+            self.pipeline.shutdown()
+        self.save_replay()
+        if self.telemetry is not None:
+            dropped = self.telemetry.close()
+            if dropped:
+                print(f"Telemetry dropped {dropped} frames")
+        preloader.shutdown()
         pygame.quit()
         sys.exit()
 
 if __name__ == "__main__":
-    game = Game()
+    parser = argparse.ArgumentParser(description="Undertale-style combat game")
+    parser.add_argument("--record", metavar="DIR", help="save a replay of each fight to its own file in DIR")
+    parser.add_argument("--seed", type=int, help="seed every fight with this value")
+    parser.add_argument("--encounter", choices=sorted(ENCOUNTERS), default=DEFAULT_ENCOUNTER,
+                        help="which enemies to fight")
+    parser.add_argument("--scale", type=int, choices=RENDER_SCALES, default=RENDER_SCALE,
+                        help="draw frames this many times smaller than the window, then upscale them")
+    parser.add_argument("--upscale", choices=UPSCALE_MODES, default=RENDER_UPSCALE,
+                        help="how frames are upscaled to the window: by SDL, or nearest-neighbour in software")
+    parser.add_argument("--pipeline", action="store_true", default=PIPELINED_SIM,
+                        help="step fights on a worker thread while the previous tick is drawn")
+    parser.add_argument("--telemetry", metavar="DIR", help="write per-frame telemetry files to DIR")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="report import times and time to first frame, then exit "
+                             "(nonzero if over STARTUP_BUDGET_MS)")
+    args = parser.parse_args()
+    
+    if startup_profiler is not None:
+        startup_profiler.mark("imports done")
+    game = Game(record_dir=args.record, seed=args.seed, encounter=args.encounter,
+                scale=args.scale, upscale=args.upscale, pipelined=args.pipeline,
+                telemetry_dir=args.telemetry)
+    if startup_profiler is not None:
+        startup_profiler.mark("game built")
     game.run()
@@ -1,9 +1,54 @@
 import pygame
 import math
 import random
+import numpy as np
 from settings import *
+from text_cache import render_text
 from sprites import get_sprite_manager
 from particles import particle_manager
+from render import view
+
+# Distinct brightness levels a star can be drawn at
+STAR_LEVELS = 64
+STAR_SIZES = (1, 2, 3)
+STAR_MIN_BRIGHTNESS = 0.3
+
+# Pre-rendered gradients by (width, height), and star sprites by size then level
+gradient_cache = {}
+star_sprites = {}
+
+def get_gradient(width, height):
+    """Menu background gradient, rendered once per resolution"""
+    gradient = gradient_cache.get((width, height))
+    if gradient is None:
+        gradient = pygame.Surface((width, height))
+        for y in range(height):
+            color_ratio = y / height
+            r = int(20 * (1 - color_ratio) + 60 * color_ratio)
+            g = int(20 * (1 - color_ratio) + 20 * color_ratio)
+            b = int(50 * (1 - color_ratio) + 100 * color_ratio)
+            pygame.draw.line(gradient, (r, g, b), (0, y), (width, y))
+        gradient_cache[(width, height)] = gradient
+    return gradient
+
+def get_star_sprites():
+    """One small sprite per star size and brightness level"""
+    if not star_sprites:
+        for size in STAR_SIZES:
+            sprites = []
+            for level in range(STAR_LEVELS):
+                brightness = int(255 * level / (STAR_LEVELS - 1))
+                color = (brightness, brightness, brightness)
+                if size == 1:
+                    sprite = pygame.Surface((1, 1))
+                    sprite.fill(color)
+                else:
+                    sprite = pygame.Surface((size * 2 + 1, size * 2 + 1))
+                    sprite.set_colorkey(BLACK)
+                    pygame.draw.circle(sprite, color, (size, size), size)
+                sprites.append(sprite)
+            star_sprites[size] = sprites
+    return star_sprites
 
 class MainMenu:
     def __init__(self, screen, font, small_font):
@@ -18,7 +63,6 @@ class MainMenu:
         # Animation variables
         self.title_pulse = 0
         self.option_hover_scale = [1.0] * len(self.options)
-        self.background_stars = []
         self.menu_alpha = 255
         
         # Sub-menu states
@@ -29,23 +73,38 @@ class MainMenu:
             "music_volume": 0.5
         }
         
-        # Generate background stars
+        # Generate background stars from the menu's own random stream
+        self.rng = random.Random()
         self.generate_stars()
+    
+    @property
+    def sprite_manager(self):
+        """Sprite manager, created on first use rather than with the menu"""
+        return get_sprite_manager()
+    
+    def reset(self):
+        """Return to the top of the main menu; stars and settings are kept"""
+        self.selected_option = 0
+        self.title_pulse = 0
+        self.option_hover_scale = [1.0] * len(self.options)
+        self.current_menu = "main"
+    
+    def generate_stars(self, count=MENU_STAR_COUNT):
+        """Generate twinkling background stars as parallel arrays"""
+        rng = np.random.default_rng(self.rng.getrandbits(32))
+        self.star_x = rng.integers(0, SCREEN_WIDTH, count, endpoint=True)
+        self.star_y = rng.integers(0, SCREEN_HEIGHT, count, endpoint=True)
+        self.star_brightness = rng.uniform(STAR_MIN_BRIGHTNESS, 1.0, count)
+        self.star_twinkle_speed = rng.uniform(0.02, 0.08, count)
+        self.star_size = rng.integers(1, 3, count, endpoint=True)
         
-        # Sprite manager
-        self.sprite_manager = get_sprite_manager()
-        
-    def generate_stars(self):
-        """Generate twinkling background stars"""
-        for _ in range(50):
-            star = {
-                'x': random.randint(0, SCREEN_WIDTH),
-                'y': random.randint(0, SCREEN_HEIGHT),
-                'brightness': random.uniform(0.3, 1.0),
-                'twinkle_speed': random.uniform(0.02, 0.08),
-                'size': random.randint(1, 3)
-            }
-            self.background_stars.append(star)
+        # Sprites are centered on the star, except single pixels; positions
+        # and sizes are on the render target
+        size = np.maximum(self.star_size // view.divisor, 1)
+        offset = np.where(size == 1, 0, size)
+        self.star_left = (self.star_x // view.divisor - offset).tolist()
+        self.star_top = (self.star_y // view.divisor - offset).tolist()
+        self.star_size_list = size.tolist()
     
     def handle_input(self, event):
         """Handle menu input events"""
@@ -114,15 +173,11 @@ class MainMenu:
             target_scale = 1.2 if i == self.selected_option else 1.0
             self.option_hover_scale[i] += (target_scale - self.option_hover_scale[i]) * 0.1
         
-        # Update twinkling stars
-        for star in self.background_stars:
-            star['brightness'] += star['twinkle_speed']
-            if star['brightness'] > 1.0:
-                star['brightness'] = 1.0
-                star['twinkle_speed'] *= -1
-            elif star['brightness'] < 0.3:
-                star['brightness'] = 0.3
-                star['twinkle_speed'] *= -1
+        # Update twinkling stars, bouncing between the brightness limits
+        self.star_brightness += self.star_twinkle_speed
+        bounced = (self.star_brightness > 1.0) | (self.star_brightness < STAR_MIN_BRIGHTNESS)
+        self.star_twinkle_speed[bounced] *= -1
+        np.clip(self.star_brightness, STAR_MIN_BRIGHTNESS, 1.0, out=self.star_brightness)
         
         # Update particle effects
         particle_manager.update()
@@ -142,41 +197,28 @@ class MainMenu:
     def draw_background(self):
         """Draw animated background"""
         # Gradient background
-        for y in range(SCREEN_HEIGHT):
-            color_ratio = y / SCREEN_HEIGHT
-            r = int(20 * (1 - color_ratio) + 60 * color_ratio)
-            g = int(20 * (1 - color_ratio) + 20 * color_ratio)
-            b = int(50 * (1 - color_ratio) + 100 * color_ratio)
-            pygame.draw.line(self.screen, (r, g, b), (0, y), (SCREEN_WIDTH, y))
+        self.screen.blit(get_gradient(*self.screen.get_size()), (0, 0))
         
-        # Draw twinkling stars
-        for star in self.background_stars:
-            brightness = int(255 * star['brightness'])
-            color = (brightness, brightness, brightness)
-            if star['size'] == 1:
-                self.screen.set_at((int(star['x']), int(star['y'])), color)
-            else:
-                pygame.draw.circle(self.screen, color, 
-                                 (int(star['x']), int(star['y'])), star['size'])
+        # Draw twinkling stars in one batch
+        sprites = get_star_sprites()
+        levels = (self.star_brightness * (STAR_LEVELS - 1)).astype(np.int32).tolist()
+        self.screen.blits([(sprites[size][level], (left, top))
+                           for size, level, left, top in zip(self.star_size_list, levels,
+                                                             self.star_left, self.star_top)], False)
     
     def draw_main_menu(self):
         """Draw the main menu"""
         # Animated title
         pulse_scale = 1.0 + 0.1 * math.sin(self.title_pulse)
         title_text = "♥ SOUL COMBAT ♥"
-        title_surface = self.font.render(title_text, True, WHITE)
+        title_surface = render_text(self.font, title_text, True, WHITE, pulse_scale)
         
-        # Scale the title
-        scaled_width = int(title_surface.get_width() * pulse_scale)
-        scaled_height = int(title_surface.get_height() * pulse_scale)
-        title_surface = pygame.transform.scale(title_surface, (scaled_width, scaled_height))
-        
-        title_rect = title_surface.get_rect(center=(SCREEN_WIDTH // 2, 150))
+        title_rect = title_surface.get_rect(center=view.point(SCREEN_WIDTH // 2, 150))
         self.screen.blit(title_surface, title_rect)
         
         # Subtitle
-        subtitle = self.small_font.render("An Undertale-Inspired Combat Experience", True, (200, 200, 200))
-        subtitle_rect = subtitle.get_rect(center=(SCREEN_WIDTH // 2, 200))
+        subtitle = render_text(self.small_font, "An Undertale-Inspired Combat Experience", True, (200, 200, 200))
+        subtitle_rect = subtitle.get_rect(center=view.point(SCREEN_WIDTH // 2, 200))
         self.screen.blit(subtitle, subtitle_rect)
         
         # Menu options
@@ -193,31 +235,26 @@ class MainMenu:
                 # Glowing border
                 glow_color = (255, 255, 100)
                 pygame.draw.rect(self.screen, glow_color, 
-                               (box_x - 2, box_y - 2, box_width + 4, box_height + 4), 2)
+                               view.rect((box_x - 2, box_y - 2, box_width + 4, box_height + 4)), view.length(2))
                 # Background highlight
                 pygame.draw.rect(self.screen, (50, 50, 100, 100), 
-                               (box_x, box_y, box_width, box_height))
+                               view.rect((box_x, box_y, box_width, box_height)))
             
             # Option border
             border_color = WHITE if i == self.selected_option else (100, 100, 100)
-            pygame.draw.rect(self.screen, border_color, (box_x, box_y, box_width, box_height), 2)
+            pygame.draw.rect(self.screen, border_color, view.rect((box_x, box_y, box_width, box_height)), view.length(2))
             
             # Option text with scaling
             scale = self.option_hover_scale[i]
             text_color = YELLOW if i == self.selected_option else WHITE
-            option_surface = self.small_font.render(option, True, text_color)
-            
-            if scale != 1.0:
-                scaled_width = int(option_surface.get_width() * scale)
-                scaled_height = int(option_surface.get_height() * scale)
-                option_surface = pygame.transform.scale(option_surface, (scaled_width, scaled_height))
+            option_surface = render_text(self.small_font, option, True, text_color, scale)
             
-            option_rect = option_surface.get_rect(center=(SCREEN_WIDTH // 2, start_y + i * 60))
+            option_rect = option_surface.get_rect(center=view.point(SCREEN_WIDTH // 2, start_y + i * 60))
             self.screen.blit(option_surface, option_rect)
         
         # Controls hint
-        controls_text = self.small_font.render("↑↓ Navigate | ENTER/Z Select", True, (150, 150, 150))
-        controls_rect = controls_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 50))
+        controls_text = render_text(self.small_font, "↑↓ Navigate | ENTER/Z Select", True, (150, 150, 150))
+        controls_rect = controls_text.get_rect(center=view.point(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 50))
         self.screen.blit(controls_text, controls_rect)
         
         # Draw menu particle effects
@@ -226,8 +263,8 @@ class MainMenu:
     def draw_instructions(self):
         """Draw the instructions screen"""
         # Title
-        title = self.font.render("HOW TO PLAY", True, WHITE)
-        title_rect = title.get_rect(center=(SCREEN_WIDTH // 2, 80))
+        title = render_text(self.font, "HOW TO PLAY", True, WHITE)
+        title_rect = title.get_rect(center=view.point(SCREEN_WIDTH // 2, 80))
         self.screen.blit(title, title_rect)
         
         # Instructions text
@@ -267,42 +304,42 @@ class MainMenu:
                 font = self.small_font
             
             if line.strip():  # Don't render empty lines
-                text_surface = font.render(line, True, color)
-                text_rect = text_surface.get_rect(center=(SCREEN_WIDTH // 2, y_offset))
+                text_surface = render_text(font, line, True, color)
+                text_rect = text_surface.get_rect(center=view.point(SCREEN_WIDTH // 2, y_offset))
                 self.screen.blit(text_surface, text_rect)
             
             y_offset += 25
         
         # Back instruction
-        back_text = self.small_font.render("Press ESC or X to go back", True, (150, 150, 150))
-        back_rect = back_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 30))
+        back_text = render_text(self.small_font, "Press ESC or X to go back", True, (150, 150, 150))
+        back_rect = back_text.get_rect(center=view.point(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 30))
         self.screen.blit(back_text, back_rect)
     
     def draw_settings(self):
         """Draw the settings screen"""
         # Title
-        title = self.font.render("SETTINGS", True, WHITE)
-        title_rect = title.get_rect(center=(SCREEN_WIDTH // 2, 80))
+        title = render_text(self.font, "SETTINGS", True, WHITE)
+        title_rect = title.get_rect(center=view.point(SCREEN_WIDTH // 2, 80))
         self.screen.blit(title, title_rect)
         
         # Difficulty setting
         difficulty_names = ["Easy", "Normal", "Hard"]
         difficulty_colors = [GREEN, YELLOW, RED]
         
-        diff_label = self.small_font.render("Difficulty:", True, WHITE)
-        diff_label_rect = diff_label.get_rect(center=(SCREEN_WIDTH // 2 - 100, 200))
+        diff_label = render_text(self.small_font, "Difficulty:", True, WHITE)
+        diff_label_rect = diff_label.get_rect(center=view.point(SCREEN_WIDTH // 2 - 100, 200))
         self.screen.blit(diff_label, diff_label_rect)
         
-        diff_value = self.small_font.render(difficulty_names[self.settings["difficulty"]], 
+        diff_value = render_text(self.small_font, difficulty_names[self.settings["difficulty"]], 
                                           True, difficulty_colors[self.settings["difficulty"]])
-        diff_value_rect = diff_value.get_rect(center=(SCREEN_WIDTH // 2 + 100, 200))
+        diff_value_rect = diff_value.get_rect(center=view.point(SCREEN_WIDTH // 2 + 100, 200))
         self.screen.blit(diff_value, diff_value_rect)
         
         # Arrows for difficulty
-        left_arrow = self.small_font.render("←", True, WHITE)
-        right_arrow = self.small_font.render("→", True, WHITE)
-        self.screen.blit(left_arrow, (SCREEN_WIDTH // 2 + 50, 185))
-        self.screen.blit(right_arrow, (SCREEN_WIDTH // 2 + 150, 185))
+        left_arrow = render_text(self.small_font, "←", True, WHITE)
+        right_arrow = render_text(self.small_font, "→", True, WHITE)
+        self.screen.blit(left_arrow, view.point(SCREEN_WIDTH // 2 + 50, 185))
+        self.screen.blit(right_arrow, view.point(SCREEN_WIDTH // 2 + 150, 185))
         
         # Instructions
         instructions = [
@@ -316,12 +353,12 @@ class MainMenu:
         y_offset = 280
         for line in instructions:
             color = WHITE if line.startswith("Use") else (180, 180, 180)
-            text_surface = self.small_font.render(line, True, color)
-            text_rect = text_surface.get_rect(center=(SCREEN_WIDTH // 2, y_offset))
+            text_surface = render_text(self.small_font, line, True, color)
+            text_rect = text_surface.get_rect(center=view.point(SCREEN_WIDTH // 2, y_offset))
             self.screen.blit(text_surface, text_rect)
             y_offset += 30
         
         # Back instruction
-        back_text = self.small_font.render("Press ESC or X to go back", True, (150, 150, 150))
-        back_rect = back_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 30))
+        back_text = render_text(self.small_font, "Press ESC or X to go back", True, (150, 150, 150))
+        back_rect = back_text.get_rect(center=view.point(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 30))
         self.screen.blit(back_text, back_rect)
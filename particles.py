@@ -1,14 +1,68 @@
 import pygame
 import random
 import math
+from collections import OrderedDict
 from settings import *
+from render import dirty_rects, view
+from pools import ObjectPool
+
+class ParticleSpriteCache:
+    """Pre-rendered particle circles keyed by (size, color, alpha level)"""
+    def __init__(self, max_sprites=PARTICLE_CACHE_SIZE, alpha_steps=PARTICLE_ALPHA_STEPS):
+        self.max_sprites = max_sprites
+        self.alpha_steps = alpha_steps
+        self.sprites = OrderedDict()
+    
+    def get(self, size, color, alpha):
+        """Get the sprite for a particle, or None if it would be invisible"""
+        level = round(alpha * (self.alpha_steps - 1) / 255)
+        if level <= 0:
+            return None
+        key = (size, color, level)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((size * 2, size * 2), pygame.SRCALPHA)
+            quantized_alpha = level * 255 // (self.alpha_steps - 1)
+            pygame.draw.circle(sprite, (*color, quantized_alpha), (size, size), size)
+            self.sprites[key] = sprite
+            # Evict the least recently used sprite once over budget
+            if len(self.sprites) > self.max_sprites:
+                self.sprites.popitem(last=False)
+        else:
+            self.sprites.move_to_end(key)
+        return sprite
+    
+    def clear(self):
+        """Drop every cached sprite"""
+        self.sprites.clear()
+
+# Shared by every effect, so the same particle looks are only rendered once
+particle_sprites = ParticleSpriteCache()
+
+def particle_blit(size, color, alpha, x, y):
+    """(sprite, position) for a particle centered at layout (x, y) on the render target, or None if invisible"""
+    divisor = view.divisor
+    if divisor > 1:
+        size = max(size // divisor, 1)
+        x /= divisor
+        y /= divisor
+    sprite = particle_sprites.get(size, color, alpha)
+    if sprite is None:
+        return None
+    return sprite, (int(x - size), int(y - size))
 
 class ParticleEffect:
-    def __init__(self, x, y, effect_type="stars"):
+    def __init__(self, x, y, effect_type="stars", rng=random, pool=None):
+        self.pool = pool  # ObjectPool of particle dicts, or None to allocate them
+        self.particles = []
+        self.start(x, y, effect_type, rng)
+    
+    def start(self, x, y, effect_type="stars", rng=random):
+        """(Re)start the effect at (x, y); pooled effects are restarted rather than rebuilt"""
+        self.rng = rng  # random stream the particles are drawn from
         self.x = x
         self.y = y
         self.effect_type = effect_type
-        self.particles = []
         self.lifetime = 0
         
         if effect_type == "stars":
@@ -20,109 +74,124 @@ class ParticleEffect:
         elif effect_type == "damage":
             self.create_damage_particles()
     
+    def emit(self, x, y, vx, vy, life, max_life, size, color):
+        """Add one particle, reusing a pooled dict when there is a pool"""
+        if self.pool is None:
+            particle = {}
+        else:
+            particle = self.pool.acquire()
+            if particle is None:
+                return  # pool exhausted and its policy drops
+        particle['x'] = x
+        particle['y'] = y
+        particle['vx'] = vx
+        particle['vy'] = vy
+        particle['life'] = life
+        particle['max_life'] = max_life
+        particle['size'] = size
+        particle['color'] = color
+        self.particles.append(particle)
+    
     def create_star_particles(self):
         """Create twinkling star particles"""
         for _ in range(20):
-            particle = {
-                'x': self.x + random.randint(-30, 30),
-                'y': self.y + random.randint(-30, 30),
-                'vx': random.uniform(-1, 1),
-                'vy': random.uniform(-1, 1),
-                'life': random.randint(30, 60),
-                'max_life': 60,
-                'size': random.randint(1, 3),
-                'color': random.choice([YELLOW, WHITE, (255, 255, 150)])
-            }
-            self.particles.append(particle)
+            self.emit(x=self.x + self.rng.randint(-30, 30),
+                      y=self.y + self.rng.randint(-30, 30),
+                      vx=self.rng.uniform(-1, 1),
+                      vy=self.rng.uniform(-1, 1),
+                      life=self.rng.randint(30, 60),
+                      max_life=60,
+                      size=self.rng.randint(1, 3),
+                      color=self.rng.choice([YELLOW, WHITE, (255, 255, 150)]))
     
     def create_explosion_particles(self):
         """Create explosion particles"""
         for _ in range(15):
-            angle = random.uniform(0, 2 * math.pi)
-            speed = random.uniform(2, 6)
-            particle = {
-                'x': self.x,
-                'y': self.y,
-                'vx': math.cos(angle) * speed,
-                'vy': math.sin(angle) * speed,
-                'life': random.randint(20, 40),
-                'max_life': 40,
-                'size': random.randint(2, 4),
-                'color': random.choice([RED, ORANGE, YELLOW])
-            }
-            self.particles.append(particle)
+            angle = self.rng.uniform(0, 2 * math.pi)
+            speed = self.rng.uniform(2, 6)
+            self.emit(x=self.x,
+                      y=self.y,
+                      vx=math.cos(angle) * speed,
+                      vy=math.sin(angle) * speed,
+                      life=self.rng.randint(20, 40),
+                      max_life=40,
+                      size=self.rng.randint(2, 4),
+                      color=self.rng.choice([RED, ORANGE, YELLOW]))
     
     def create_heal_particles(self):
         """Create healing particles"""
         for _ in range(12):
-            particle = {
-                'x': self.x + random.randint(-20, 20),
-                'y': self.y,
-                'vx': random.uniform(-0.5, 0.5),
-                'vy': random.uniform(-2, -1),
-                'life': random.randint(40, 60),
-                'max_life': 60,
-                'size': random.randint(2, 4),
-                'color': random.choice([GREEN, (0, 255, 100), (100, 255, 100)])
-            }
-            self.particles.append(particle)
+            self.emit(x=self.x + self.rng.randint(-20, 20),
+                      y=self.y,
+                      vx=self.rng.uniform(-0.5, 0.5),
+                      vy=self.rng.uniform(-2, -1),
+                      life=self.rng.randint(40, 60),
+                      max_life=60,
+                      size=self.rng.randint(2, 4),
+                      color=self.rng.choice([GREEN, (0, 255, 100), (100, 255, 100)]))
     
     def create_damage_particles(self):
         """Create damage particles"""
         for _ in range(10):
-            angle = random.uniform(-math.pi/4, math.pi/4)  # Upward spread
-            speed = random.uniform(1, 4)
-            particle = {
-                'x': self.x,
-                'y': self.y,
-                'vx': math.sin(angle) * speed,
-                'vy': -math.cos(angle) * speed,
-                'life': random.randint(15, 30),
-                'max_life': 30,
-                'size': random.randint(1, 3),
-                'color': random.choice([RED, (255, 100, 100), (200, 0, 0)])
-            }
-            self.particles.append(particle)
+            angle = self.rng.uniform(-math.pi/4, math.pi/4)  # Upward spread
+            speed = self.rng.uniform(1, 4)
+            self.emit(x=self.x,
+                      y=self.y,
+                      vx=math.sin(angle) * speed,
+                      vy=-math.cos(angle) * speed,
+                      life=self.rng.randint(15, 30),
+                      max_life=30,
+                      size=self.rng.randint(1, 3),
+                      color=self.rng.choice([RED, (255, 100, 100), (200, 0, 0)]))
     
     def update(self):
         """Update all particles"""
         self.lifetime += 1
+        gravity = self.effect_type in ("explosion", "damage")
         
-        for particle in self.particles[:]:
+        # Keep live particles in place and hand dead ones back to the pool,
+        # without building a new list
+        particles = self.particles
+        alive = 0
+        for particle in particles:
             particle['x'] += particle['vx']
             particle['y'] += particle['vy']
             particle['life'] -= 1
             
             # Apply gravity for some effects
-            if self.effect_type in ["explosion", "damage"]:
+            if gravity:
                 particle['vy'] += 0.1
             
-            # Remove dead particles
-            if particle['life'] <= 0:
-                self.particles.remove(particle)
+            if particle['life'] > 0:
+                particles[alive] = particle
+                alive += 1
+            elif self.pool is not None:
+                self.pool.release(particle)
+        del particles[alive:]
     
-    def draw(self, screen):
-        """Draw all particles"""
+    def release_particles(self):
+        """Hand every particle back to the pool"""
+        if self.pool is not None:
+            for particle in self.particles:
+                self.pool.release(particle)
+        self.particles.clear()
+    
+    def blit_sequence(self):
+        """(sprite, position) pairs for every visible particle"""
+        sequence = []
         for particle in self.particles:
             # Calculate alpha based on remaining life
             alpha_ratio = particle['life'] / particle['max_life']
             alpha = int(255 * alpha_ratio)
             
-            # Create surface with alpha for transparency
-            particle_surface = pygame.Surface((particle['size'] * 2, particle['size'] * 2), pygame.SRCALPHA)
-            color_with_alpha = (*particle['color'], alpha)
-            
-            if self.effect_type == "stars":
-                # Draw twinkling star
-                pygame.draw.circle(particle_surface, color_with_alpha, 
-                                 (particle['size'], particle['size']), particle['size'])
-            else:
-                # Draw circle particle
-                pygame.draw.circle(particle_surface, color_with_alpha, 
-                                 (particle['size'], particle['size']), particle['size'])
-            
-            screen.blit(particle_surface, (int(particle['x'] - particle['size']), 
-                                         int(particle['y'] - particle['size'])))
+            blit = particle_blit(particle['size'], particle['color'], alpha, particle['x'], particle['y'])
+            if blit is not None:
+                sequence.append(blit)
+        return sequence
+    
+    def draw(self, screen):
+        """Draw all particles"""
+        screen.blits(self.blit_sequence(), False)
     
     def is_finished(self):
         """Check if the effect is finished"""
@@ -131,27 +200,122 @@ class ParticleEffect:
 class ParticleManager:
     def __init__(self):
         self.effects = []
+        # Own random stream, so effects never disturb a fight's random state
+        self.rng = random.Random()
+        
+        # Particles and effects come from preallocated pools, so effects
+        # added mid-fight don't allocate
+        self.particle_pool = ObjectPool(dict, PARTICLE_POOL_CAPACITY, PARTICLE_POOL_MAX,
+                                        PARTICLE_POOL_POLICY, self.reclaim_particle)
+        self.effect_pool = ObjectPool(lambda: ParticleEffect(0, 0, None, self.rng, self.particle_pool),
+                                      EFFECT_POOL_CAPACITY, EFFECT_POOL_MAX,
+                                      EFFECT_POOL_POLICY, self.reclaim_effect)
+    
+    def seed(self, seed):
+        """Seed the random stream effects are drawn from"""
+        self.rng.seed(seed)
     
     def add_effect(self, x, y, effect_type="stars"):
         """Add a new particle effect"""
-        effect = ParticleEffect(x, y, effect_type)
+        effect = self.effect_pool.acquire()
+        if effect is None:
+            return  # pool exhausted and its policy drops
+        # Listed before its particles are made, so recycling can find it
         self.effects.append(effect)
+        effect.start(x, y, effect_type, self.rng)
     
     def update(self):
         """Update all effects"""
-        for effect in self.effects[:]:
+        effects = self.effects
+        alive = 0
+        for effect in effects:
             effect.update()
             if effect.is_finished():
-                self.effects.remove(effect)
+                self.effect_pool.release(effect)
+            else:
+                effects[alive] = effect
+                alive += 1
+        del effects[alive:]
+    
+    def reclaim_effect(self):
+        """Recycle policy: retire the oldest effect"""
+        if not self.effects:
+            return False
+        effect = self.effects.pop(0)
+        effect.release_particles()
+        self.effect_pool.release(effect)
+        return True
+    
+    def reclaim_particle(self):
+        """Recycle policy: retire the oldest particle of the oldest effect that has one"""
+        for effect in self.effects:
+            if effect.particles:
+                self.particle_pool.release(effect.particles.pop(0))
+                return True
+        return False
     
     def draw(self, screen):
-        """Draw all effects"""
+        """Draw all effects in a single batch"""
+        sequence = []
+        counts = []
         for effect in self.effects:
-            effect.draw(screen)
+            effect_sequence = effect.blit_sequence()
+            sequence.extend(effect_sequence)
+            counts.append(len(effect_sequence))
+        rects = screen.blits(sequence)
+        
+        # Report the area each effect covers
+        start = 0
+        for count in counts:
+            dirty_rects.add_union(rects[start:start + count])
+            start += count
+    
+    def particle_count(self):
+        """Number of live particles across all effects"""
+        return sum(len(effect.particles) for effect in self.effects)
+    
+    def snapshot(self):
+        """A copy of every visible particle, for drawing while the effects keep updating"""
+        return ParticleSnapshot(tuple(
+            tuple((particle['size'], particle['color'], int(255 * particle['life'] / particle['max_life']),
+                   particle['x'], particle['y'])
+                  for particle in effect.particles)
+            for effect in self.effects))
     
     def clear(self):
         """Clear all effects"""
+        for effect in self.effects:
+            effect.release_particles()
+            self.effect_pool.release(effect)
         self.effects.clear()
 
+class ParticleSnapshot:
+    """Particles frozen between ticks, drawn like ParticleManager.draw"""
+    def __init__(self, effects):
+        self.effects = effects  # per effect, (size, color, alpha, x, y) of each particle
+    
+    def particle_count(self):
+        return sum(len(particles) for particles in self.effects)
+    
+    def draw(self, screen):
+        """Draw all effects in a single batch"""
+        sequence = []
+        counts = []
+        for particles in self.effects:
+            count = 0
+            for particle in particles:
+                blit = particle_blit(*particle)
+                if blit is not None:
+                    sequence.append(blit)
+                    count += 1
+            counts.append(count)
+        rects = screen.blits(sequence)
+        
+        # Report the area each effect covers
+        start = 0
+        for count in counts:
+            dirty_rects.add_union(rects[start:start + count])
+            start += count
+
 # Global particle manager
 particle_manager = ParticleManager()
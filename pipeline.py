@@ -0,0 +1,61 @@
+"""
+Pipelined simulation and rendering (`python main.py --pipeline`).
+Each frame the main thread hands the ticks that are due to a worker thread
+and, while they run, draws and presents the snapshot the worker published
+at the end of the previous batch. pygame and NumPy release the GIL in
+their bigger blits, array operations and the flip, so the two overlap;
+the price is that the screen shows the fight one frame late.
+
+Ownership: between submit() and wait() the fight, with its enemies,
+bullets and the particle manager, belongs to the worker, and the main
+thread only reads `frame`, a CombatSnapshot that nothing mutates. Once
+wait() returns, the fight is the main thread's again until the next
+submit(). Events, input polling and pygame calls stay on the main thread.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from profiler import profiler
+
+class FramePipeline:
+    """Double-buffered fight snapshots: `frame` is drawn while the worker builds the next"""
+    def __init__(self):
+        self.executor = None  # started on the first batch
+        self.frame = None  # front buffer, drawn by the main thread
+        self.job = None  # Future building the back buffer
+    
+    def submit(self, combat, inputs):
+        """Start running one tick of `combat` per input on the worker"""
+        if self.frame is None:
+            # Nothing drawn from this fight yet: start from where it stands
+            self.frame = combat.snapshot()
+        if not inputs:
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="simulation")
+        self.job = self.executor.submit(self.advance, combat, inputs)
+    
+    @staticmethod
+    def advance(combat, inputs):
+        """Worker thread: run the ticks, then freeze the result"""
+        with profiler.span("update"):
+            for buttons in inputs:
+                combat.advance(buttons)
+            return combat.snapshot()
+    
+    def wait(self):
+        """Wait for the batch in flight, then swap its snapshot to the front"""
+        if self.job is not None:
+            job, self.job = self.job, None
+            self.frame = job.result()
+    
+    def clear(self):
+        """Forget the last fight's snapshots, once the worker is done with it"""
+        self.wait()
+        self.frame = None
+    
+    def shutdown(self):
+        """Finish the batch in flight and stop the worker"""
+        self.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
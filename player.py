@@ -1,10 +1,13 @@
+import copy
 import pygame
 from settings import *
+from text_cache import render_text
 from sprites import get_sprite_manager
-from particles import particle_manager
+from controls import *
+from render import dirty_rects, view
 
 class Player:
-    def __init__(self):
+    def __init__(self, effects=None):
         # Player position (heart/soul)
         self.rect = pygame.Rect(
             COMBAT_BOX_X + COMBAT_BOX_WIDTH // 2 - PLAYER_SIZE // 2,
@@ -12,6 +15,7 @@ class Player:
             PLAYER_SIZE,
             PLAYER_SIZE
         )
+        self.previous_center = self.rect.center  # center before the last tick, for interpolation
         self.speed = PLAYER_SPEED
         self.hp = PLAYER_HP
         self.max_hp = PLAYER_HP
@@ -25,19 +29,34 @@ class Player:
         self.invincible = False
         self.invincible_timer = 0
         self.invincible_duration = 60  # 1 second at 60fps
+        self.hits = 0  # hits taken this fight
         
-        # Sprite manager
-        self.sprite_manager = get_sprite_manager()
-        
+        # Particle manager for hit feedback (None when running headless)
+        self.effects = effects
+    
+    @property
+    def sprite_manager(self):
+        """Sprite manager, created on first draw so headless fights never build sprites"""
+        return get_sprite_manager()
+    
     def reset(self):
         """Reset player for new combat"""
         self.rect.x = COMBAT_BOX_X + COMBAT_BOX_WIDTH // 2 - PLAYER_SIZE // 2
         self.rect.y = COMBAT_BOX_Y + COMBAT_BOX_HEIGHT // 2 - PLAYER_SIZE // 2
+        self.previous_center = self.rect.center
         self.hp = self.max_hp
         self.made_move = False
         self.selected_action = 0
         self.invincible = False
         self.invincible_timer = 0
+        self.hits = 0
+    
+    def snapshot(self):
+        """A copy for drawing while the fight keeps changing this player"""
+        frozen = copy.copy(self)
+        frozen.rect = self.rect.copy()
+        frozen.effects = None  # drawing never adds effects
+        return frozen
     
     def handle_input_menu(self, keys):
         """Handle input during menu selection"""
@@ -50,18 +69,17 @@ class Player:
             return True
         return False
     
-    def handle_input_dodge(self, keys):
-        """Handle input during dodge phase"""
-        old_x, old_y = self.rect.x, self.rect.y
-        
-        if keys[pygame.K_UP] or keys[pygame.K_w]:
-            self.rect.y -= self.speed
-        if keys[pygame.K_DOWN] or keys[pygame.K_s]:
-            self.rect.y += self.speed
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            self.rect.x -= self.speed
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            self.rect.x += self.speed
+    def handle_input_dodge(self, buttons, ticks=1):
+        """Handle input during dodge phase from a controls bitmask, held for `ticks` ticks"""
+        distance = self.speed * ticks
+        if buttons & INPUT_UP:
+            self.rect.y -= distance
+        if buttons & INPUT_DOWN:
+            self.rect.y += distance
+        if buttons & INPUT_LEFT:
+            self.rect.x -= distance
+        if buttons & INPUT_RIGHT:
+            self.rect.x += distance
         
         # Keep player within combat box
         if self.rect.left < COMBAT_BOX_X:
@@ -73,10 +91,11 @@ class Player:
         if self.rect.bottom > COMBAT_BOX_Y + COMBAT_BOX_HEIGHT:
             self.rect.bottom = COMBAT_BOX_Y + COMBAT_BOX_HEIGHT
     
-    def update(self):
+    def update(self, ticks=1):
         """Update player state"""
+        self.previous_center = self.rect.center
         if self.invincible:
-            self.invincible_timer -= 1
+            self.invincible_timer -= ticks
             if self.invincible_timer <= 0:
                 self.invincible = False
     
@@ -84,10 +103,12 @@ class Player:
         """Take damage if not invincible"""
         if not self.invincible:
             self.hp -= damage
+            self.hits += 1
             self.invincible = True
             self.invincible_timer = self.invincible_duration
             # Add damage particle effect
-            particle_manager.add_effect(self.rect.centerx, self.rect.centery, "damage")
+            if self.effects is not None:
+                self.effects.add_effect(self.rect.centerx, self.rect.centery, "damage")
             return True
         return False
     
@@ -102,17 +123,20 @@ class Player:
             
             # Draw selection box
             color = WHITE if i == self.selected_action else (100, 100, 100)
-            pygame.draw.rect(screen, color, (x, menu_y, box_width, box_height), 2)
+            pygame.draw.rect(screen, color, view.rect((x, menu_y, box_width, box_height)), view.length(2))
             
             # Draw action text
-            text = font.render(action, True, WHITE)
-            text_rect = text.get_rect(center=(x + box_width // 2, menu_y + box_height // 2))
+            text = render_text(font, action, True, WHITE)
+            text_rect = text.get_rect(center=view.point(x + box_width // 2, menu_y + box_height // 2))
             screen.blit(text, text_rect)
+        
+        # The selection box moves between actions
+        dirty_rects.add(view.rect((100, menu_y, len(self.actions) * (box_width + 20), box_height)))
     
     def draw_hp_bar(self, screen, font):
         """Draw HP bar"""
-        hp_text = font.render(f"HP: {self.hp}/{self.max_hp}", True, WHITE)
-        screen.blit(hp_text, (20, 20))
+        hp_text = render_text(font, f"HP: {self.hp}/{self.max_hp}", True, WHITE)
+        dirty_rects.add(screen.blit(hp_text, view.point(20, 20)))
         
         # HP bar
         bar_width = 200
@@ -121,18 +145,18 @@ class Player:
         bar_y = 50
         
         # Background
-        pygame.draw.rect(screen, (100, 0, 0), (bar_x, bar_y, bar_width, bar_height))
+        pygame.draw.rect(screen, (100, 0, 0), view.rect((bar_x, bar_y, bar_width, bar_height)))
         
         # Current HP
         hp_percentage = self.hp / self.max_hp
         current_width = int(bar_width * hp_percentage)
-        pygame.draw.rect(screen, RED, (bar_x, bar_y, current_width, bar_height))
+        pygame.draw.rect(screen, RED, view.rect((bar_x, bar_y, current_width, bar_height)))
         
         # Border
-        pygame.draw.rect(screen, WHITE, (bar_x, bar_y, bar_width, bar_height), 2)
+        dirty_rects.add(pygame.draw.rect(screen, WHITE, view.rect((bar_x, bar_y, bar_width, bar_height)), view.length(2)))
     
-    def draw(self, screen):
-        """Draw the player (heart/soul)"""
+    def draw(self, screen, alpha=1.0):
+        """Draw the player (heart/soul), `alpha` of the way between the last two ticks"""
         # Flicker if invincible
         if self.invincible and self.invincible_timer % 10 < 5:
             return
@@ -143,10 +167,16 @@ class Player:
         else:
             sprite = self.sprite_manager.get_sprite('player_heart')
         
+        # Interpolate between the last two ticks
+        previous_x, previous_y = self.previous_center
+        center = (int(previous_x + (self.rect.centerx - previous_x) * alpha),
+                  int(previous_y + (self.rect.centery - previous_y) * alpha))
+        
         if sprite:
             # Center the sprite on the player rectangle
-            sprite_rect = sprite.get_rect(center=self.rect.center)
-            screen.blit(sprite, sprite_rect)
+            sprite_rect = sprite.get_rect(center=view.point(*center))
+            dirty_rects.add(screen.blit(sprite, sprite_rect))
         else:
             # Fallback to colored rectangle if sprite not available
-            pygame.draw.rect(screen, RED, self.rect)
+            dirty_rects.add(pygame.draw.rect(screen, RED, view.rect(self.rect.move(center[0] - self.rect.centerx,
+                                                                   center[1] - self.rect.centery))))
@@ -0,0 +1,49 @@
+"""
+Preallocated object pools.
+Objects are built up front and handed out from a free list, so effects
+created mid-fight reuse old objects instead of allocating new ones. What
+happens once every object is in use is the pool's policy:
+
+    drop     acquire() returns None and the request is skipped
+    grow     build another object, up to max_size, then drop
+    recycle  ask the owner to give back its oldest object and reuse it
+"""
+
+POOL_POLICIES = ("drop", "grow", "recycle")
+
+class ObjectPool:
+    def __init__(self, factory, capacity, max_size=0, policy="grow", reclaim=None):
+        if policy not in POOL_POLICIES:
+            raise ValueError(f"Unknown pool policy {policy!r}, expected one of {POOL_POLICIES}")
+        self.factory = factory
+        self.policy = policy
+        self.max_size = max(capacity, max_size)
+        # Called under the recycle policy; must release at least one object
+        # back to the pool and return True, or return False if it can't
+        self.reclaim = reclaim
+        
+        self.free = [factory() for _ in range(capacity)]
+        self.size = capacity  # objects built, in use or free
+        self.dropped = 0
+        self.recycled = 0
+    
+    @property
+    def in_use(self):
+        return self.size - len(self.free)
+    
+    def acquire(self):
+        """A free object, or None if the pool is exhausted and its policy drops"""
+        if self.free:
+            return self.free.pop()
+        if self.policy == "grow" and self.size < self.max_size:
+            self.size += 1
+            return self.factory()
+        if self.policy == "recycle" and self.reclaim is not None and self.reclaim():
+            self.recycled += 1
+            return self.free.pop()
+        self.dropped += 1
+        return None
+    
+    def release(self, obj):
+        """Return an object to the free list"""
+        self.free.append(obj)
@@ -0,0 +1,165 @@
+"""
+Per-phase frame profiler.
+Code wraps each phase of a frame in `with profiler.span("name"):`. Phase
+times for the last PROFILE_FRAMES frames are kept in a ring buffer, shown
+by a toggleable overlay (F3) and dumped to CSV on demand (F4). While
+disabled, span() hands back a shared do-nothing context, so leaving the
+spans in costs next to nothing.
+"""
+
+import time
+import numpy as np
+import pygame
+from settings import *
+from render import dirty_rects, view
+
+# Frame phases, in the order the overlay lists them. Spans may nest:
+# "particles" is part of "update", and "bullets" is part of "draw". With
+# the pipeline on, "update" runs on its worker alongside "draw" and
+# "present", and "sync" is the time spent waiting for it to finish
+PHASES = ("events", "update", "particles", "draw", "bullets", "present", "sync", "wait")
+
+class NullSpan:
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Span:
+    """Adds the time spent inside it to one phase of the current frame"""
+    def __init__(self, totals, index):
+        self.totals = totals
+        self.index = index
+        self.start = 0.0
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.totals[self.index] += time.perf_counter() - self.start
+        return False
+
+class FrameProfiler:
+    def __init__(self, frames=PROFILE_FRAMES):
+        self.enabled = False
+        self.frames = frames
+        
+        # Ring buffer: one row per frame, milliseconds per phase
+        self.phase_ms = np.zeros((frames, len(PHASES)), dtype=np.float32)
+        self.frame_ms = np.zeros(frames, dtype=np.float32)
+        self.bullets = np.zeros(frames, dtype=np.int32)
+        self.particles = np.zeros(frames, dtype=np.int32)
+        self.recorded = 0  # frames recorded since the last reset
+        
+        # Phase totals of the frame in progress, in seconds
+        self.totals = [0.0] * len(PHASES)
+        self.spans = {name: Span(self.totals, i) for i, name in enumerate(PHASES)}
+        self.frame_start = time.perf_counter()
+        
+        self.overlay = None
+        self.overlay_age = 0
+    
+    def toggle(self):
+        """Turn recording and the overlay on or off"""
+        self.enabled = not self.enabled
+        self.reset()
+        dirty_rects.invalidate()
+    
+    def reset(self):
+        """Forget every recorded frame"""
+        self.recorded = 0
+        self.totals[:] = [0.0] * len(PHASES)
+        self.frame_start = time.perf_counter()
+        self.overlay = None
+    
+    def span(self, name):
+        """Context manager timing one phase of the current frame"""
+        if not self.enabled:
+            return NULL_SPAN
+        return self.spans[name]
+    
+    def end_frame(self, bullets=0, particles=0):
+        """Close the current frame and store it in the ring buffer"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        row = self.recorded % self.frames
+        self.phase_ms[row] = self.totals
+        self.phase_ms[row] *= 1000
+        self.frame_ms[row] = (now - self.frame_start) * 1000
+        self.bullets[row] = bullets
+        self.particles[row] = particles
+        self.recorded += 1
+        
+        self.totals[:] = [0.0] * len(PHASES)
+        self.frame_start = now
+    
+    def history(self):
+        """Row indices of the recorded frames, oldest first"""
+        count = min(self.recorded, self.frames)
+        return (np.arange(self.recorded - count, self.recorded)) % self.frames
+    
+    def dump_csv(self, path):
+        """Write every buffered frame to a CSV file"""
+        rows = self.history()
+        frame_numbers = np.arange(self.recorded - len(rows), self.recorded)
+        table = np.column_stack([frame_numbers, self.frame_ms[rows], self.phase_ms[rows],
+                                 self.bullets[rows], self.particles[rows]])
+        header = ",".join(["frame", "frame_ms"] + [f"{name}_ms" for name in PHASES] +
+                          ["bullets", "particles"])
+        formats = ["%d", "%.3f"] + ["%.3f"] * len(PHASES) + ["%d", "%d"]
+        np.savetxt(path, table, fmt=formats, delimiter=",", header=header, comments="")
+        return len(rows)
+    
+    def draw(self, screen, font):
+        """Draw the overlay, rebuilding it every PROFILE_OVERLAY_REFRESH frames"""
+        if not self.enabled or not self.recorded:
+            return
+        self.overlay_age += 1
+        if self.overlay is None or self.overlay_age >= PROFILE_OVERLAY_REFRESH:
+            self.overlay = self.build_overlay(font)
+            self.overlay_age = 0
+        dirty_rects.add(screen.blit(self.overlay, view.point(5, 5)))
+    
+    def build_overlay(self, font):
+        """Render the stats panel and frame-time graph to a surface"""
+        rows = self.history()
+        recent = rows[-SIM_RATE:]  # averages cover about the last second
+        frame_ms = float(self.frame_ms[recent].mean())
+        phase_ms = self.phase_ms[recent].mean(axis=0)
+        
+        lines = [f"FPS {1000 / frame_ms if frame_ms else 0:5.1f}   frame {frame_ms:5.2f} ms"]
+        lines += [f"{name:10s} {ms:6.2f} ms" for name, ms in zip(PHASES, phase_ms)]
+        lines.append(f"bullets {self.bullets[rows[-1]]}   particles {self.particles[rows[-1]]}")
+        
+        line_height = font.get_linesize()
+        graph_height = view.length(40)
+        width = view.length(200)
+        height = line_height * len(lines) + graph_height + 15
+        
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 180))
+        # Rendered directly: these strings change every refresh and would
+        # only push reusable text out of the shared cache
+        for i, line in enumerate(lines):
+            panel.blit(font.render(line, True, WHITE), (5, 5 + i * line_height))
+        
+        # Frame times, newest on the right; the line marks one display frame
+        graph_top = height - graph_height - 5
+        budget_ms = 1000 / (FPS or SIM_RATE)
+        scale = graph_height / (budget_ms * 2)
+        pygame.draw.line(panel, GRAY, (5, graph_top + graph_height - budget_ms * scale),
+                         (width - 5, graph_top + graph_height - budget_ms * scale))
+        times = self.frame_ms[rows[-(width - 10):]]
+        if len(times) > 1:
+            heights = np.minimum(times * scale, graph_height)
+            points = np.column_stack([5 + np.arange(len(times)), graph_top + graph_height - heights])
+            pygame.draw.lines(panel, GREEN, False, points.tolist())
+        return panel
+
+# Global frame profiler
+profiler = FrameProfiler()
@@ -0,0 +1,133 @@
+"""
+Dirty-rectangle presentation.
+Layers that change from frame to frame report the screen areas they drew
+to; only those areas (and the ones drawn last frame, so vacated pixels are
+cleared) are pushed to the display. Big changes fall back to a full flip.
+
+The game is laid out on a SCREEN_WIDTH x SCREEN_HEIGHT screen, but frames
+can be drawn into a render target a whole factor smaller, so every blit
+touches fewer pixels; `view` maps layout coordinates onto the target, which
+is upscaled to the window as it is presented.
+"""
+
+import pygame
+from settings import *
+
+UPSCALE_MODES = ("scaled", "nearest")
+
+class DirtyRects:
+    def __init__(self, size=(SCREEN_WIDTH, SCREEN_HEIGHT),
+                 area_threshold=DIRTY_AREA_THRESHOLD, max_rects=DIRTY_MAX_RECTS):
+        self.screen_rect = pygame.Rect((0, 0), size)
+        self.area_threshold = area_threshold
+        self.max_rects = max_rects
+        self.rects = []
+        self.previous_rects = []
+        self.full_redraw = True
+        
+        # Offscreen render target copied onto the display `scale` times
+        # larger at present time; None when frames are drawn to the display
+        self.target = None
+        self.scale = 1
+    
+    def add(self, rect):
+        """Report an area drawn to this frame"""
+        rect = self.screen_rect.clip(rect)
+        if rect.width and rect.height:
+            self.rects.append(rect)
+    
+    def add_union(self, rects):
+        """Report the bounding box of several areas drawn to this frame"""
+        if rects:
+            self.add(rects[0].unionall(rects[1:]))
+    
+    def invalidate(self):
+        """Push the whole screen this frame, e.g. after a scene change"""
+        self.full_redraw = True
+    
+    def present(self):
+        """Push this frame's changes to the display"""
+        rects = self.rects + self.previous_rects
+        area = sum(rect.width * rect.height for rect in rects)
+        screen_area = self.screen_rect.width * self.screen_rect.height
+        
+        full = (self.full_redraw or len(rects) > self.max_rects or
+                area > screen_area * self.area_threshold)
+        if self.target is not None:
+            rects = self.upscale([self.screen_rect] if full else rects)
+        
+        if full:
+            pygame.display.flip()
+        elif rects:
+            pygame.display.update(rects)
+        
+        self.previous_rects = self.rects
+        self.rects = []
+        self.full_redraw = False
+    
+    def upscale(self, rects):
+        """Copy areas of the render target onto the display, `scale` times larger; returns the display areas"""
+        display = pygame.display.get_surface()
+        scaled = []
+        for rect in rects:
+            area = pygame.Rect(rect.x * self.scale, rect.y * self.scale,
+                               rect.width * self.scale, rect.height * self.scale)
+            # transform.scale is nearest-neighbour, so every pixel becomes a solid block
+            pygame.transform.scale(self.target.subsurface(rect), area.size, display.subsurface(area))
+            scaled.append(area)
+        return scaled
+
+class View:
+    """Maps the SCREEN_WIDTH x SCREEN_HEIGHT layout onto the render target,
+    which is `divisor` times smaller on each side"""
+    def __init__(self, divisor=1):
+        self.divisor = divisor
+    
+    def point(self, x, y):
+        """Target position of a layout point"""
+        return x // self.divisor, y // self.divisor
+    
+    def rect(self, rect):
+        """Target area covered by a layout rect"""
+        left, top, width, height = rect
+        divisor = self.divisor
+        # Scale the edges, so rects that share an edge still share it
+        return pygame.Rect(left // divisor, top // divisor,
+                           (left + width) // divisor - left // divisor, (top + height) // divisor - top // divisor)
+    
+    def length(self, value):
+        """A layout length on the target, never under a pixel: line widths, font and sprite sizes"""
+        return max(value // self.divisor, 1)
+
+# Global dirty rectangle tracker and layout mapping
+dirty_rects = DirtyRects()
+view = View()
+
+def create_display(scale=RENDER_SCALE, upscale=RENDER_UPSCALE):
+    """Open the SCREEN_WIDTH x SCREEN_HEIGHT window and return the render target to
+    draw into, `scale` times smaller on each side"""
+    if upscale not in UPSCALE_MODES:
+        raise ValueError(f"Unknown upscale mode {upscale!r}, expected one of {UPSCALE_MODES}")
+    if SCREEN_WIDTH % scale or SCREEN_HEIGHT % scale:
+        raise ValueError(f"Render scale {scale} does not divide the {SCREEN_WIDTH}x{SCREEN_HEIGHT} screen")
+    size = (SCREEN_WIDTH // scale, SCREEN_HEIGHT // scale)
+    view.divisor = scale
+    dirty_rects.screen_rect = pygame.Rect((0, 0), size)
+    dirty_rects.target = None
+    dirty_rects.scale = 1
+    dirty_rects.invalidate()
+    if scale == 1:
+        return pygame.display.set_mode(size)
+    
+    if upscale == "scaled":
+        # The display surface stays target-sized and SDL stretches it to the
+        # window when presenting. The mode can only be set once per process
+        from pygame._sdl2.video import Window
+        screen = pygame.display.set_mode(size, pygame.SCALED)
+        Window.from_display_module().size = (SCREEN_WIDTH, SCREEN_HEIGHT)
+        return screen
+    
+    display = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    dirty_rects.target = pygame.Surface(size).convert(display)
+    dirty_rects.scale = scale
+    return dirty_rects.target
@@ -0,0 +1,135 @@
+"""
+Deterministic fight replays.
+A replay is the fight's seed and encounter plus the input bitmask for
+every tick, run-length encoded, and the outcome the fight reached. Playing it back
+through CombatSim must reach the same outcome; if it doesn't, the
+simulation has desynced.
+
+    python main.py --record replays/              # record while playing, a file per fight
+    python replay.py fight.replay                 # headless, as fast as possible
+    python replay.py --render fight.replay        # watch it at real time
+    python replay.py replays/*.replay             # check a whole corpus
+"""
+
+import os
+import sys
+import argparse
+import struct
+import time
+import numpy as np
+from settings import *
+
+REPLAY_MAGIC = b"SOUL"
+REPLAY_VERSION = 2
+
+# magic, version, seed, ticks, player hp, total enemy hp, final state, run
+# count, encounter name
+HEADER = struct.Struct("<4sHQIiiBI16s")
+RUN_DTYPE = np.dtype([("buttons", "<u2"), ("count", "<u2")])
+STATES = ["player_turn", "turn_transition", "enemy_turn", "victory", "game_over"]
+
+class ReplayRecorder:
+    """Collects one input bitmask per tick as (buttons, count) runs"""
+    def __init__(self, seed, encounter=DEFAULT_ENCOUNTER):
+        self.seed = seed
+        self.encounter = encounter
+        self.runs = []
+    
+    def record(self, buttons):
+        """Add one tick of input"""
+        if self.runs and self.runs[-1][0] == buttons and self.runs[-1][1] < 0xFFFF:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([buttons, 1])
+    
+    def save(self, path, sim):
+        """Write the replay, with the outcome `sim` reached, to `path`"""
+        replay = Replay(self.seed, np.array([tuple(run) for run in self.runs], dtype=RUN_DTYPE),
+                        outcome_of(sim), self.encounter)
+        replay.save(path)
+        return replay
+
+class Replay:
+    def __init__(self, seed, runs, outcome, encounter=DEFAULT_ENCOUNTER):
+        self.seed = seed
+        self.runs = runs
+        self.outcome = outcome  # (ticks, player hp, total enemy hp, state)
+        self.encounter = encounter
+    
+    @property
+    def ticks(self):
+        return int(self.runs["count"].sum())
+    
+    def inputs(self):
+        """The input bitmask for every tick, in order"""
+        return np.repeat(self.runs["buttons"], self.runs["count"]).tolist()
+    
+    def save(self, path):
+        ticks, player_hp, enemy_hp, state = self.outcome
+        with open(path, "wb") as replay_file:
+            replay_file.write(HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, ticks,
+                                          player_hp, enemy_hp, STATES.index(state), len(self.runs),
+                                          self.encounter.encode()))
+            replay_file.write(self.runs.tobytes())
+
+def load_replay(path):
+    """Read a replay written by Replay.save"""
+    with open(path, "rb") as replay_file:
+        data = replay_file.read()
+    magic, version, seed, ticks, player_hp, enemy_hp, state, run_count, encounter = HEADER.unpack_from(data)
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+        raise ValueError(f"{path} is not a version {REPLAY_VERSION} replay")
+    runs = np.frombuffer(data, dtype=RUN_DTYPE, count=run_count, offset=HEADER.size)
+    return Replay(seed, runs, (ticks, player_hp, enemy_hp, STATES[state]),
+                  encounter.rstrip(b"\0").decode())
+
+def outcome_of(sim):
+    """What a replay checks: ticks taken, player and total enemy HP and the final state"""
+    return (sim.ticks, sim.player.hp, sum(enemy.hp for enemy in sim.enemies), sim.state)
+
+def play_headless(replay, sim=None):
+    """Replay as fast as possible; returns the outcome reached"""
+    from combat_sim import CombatSim
+    if sim is None:
+        sim = CombatSim()
+    sim.reset(replay.seed, replay.encounter)
+    for buttons in replay.inputs():
+        sim.step(buttons)
+    return outcome_of(sim)
+
+def play_rendered(replay):
+    """Replay in a window at real time"""
+    from main import Game
+    game = Game(encounter=replay.encounter)
+    game.state = "combat"
+    game.combat.reset(replay.seed, replay.encounter)
+    game.combat.playback = iter(replay.inputs())
+    game.run()
+
+def main():
+    parser = argparse.ArgumentParser(description="Play back recorded fights")
+    parser.add_argument("replays", nargs="+", help="replay files")
+    parser.add_argument("--render", action="store_true", help="watch the first replay at real time")
+    args = parser.parse_args()
+    
+    if args.render:
+        play_rendered(load_replay(args.replays[0]))
+        return
+    
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    from combat_sim import CombatSim
+    sim = CombatSim()
+    desyncs = 0
+    for path in args.replays:
+        replay = load_replay(path)
+        start = time.perf_counter()
+        outcome = play_headless(replay, sim)
+        elapsed = time.perf_counter() - start
+        status = "ok" if outcome == replay.outcome else f"DESYNC (expected {replay.outcome}, got {outcome})"
+        desyncs += outcome != replay.outcome
+        print(f"{path}: {replay.ticks} ticks in {elapsed * 1000:.1f} ms "
+              f"({replay.ticks / elapsed:.0f} ticks/s) {status}")
+    sys.exit(1 if desyncs else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Scene transitions with background preparation.
+Work that a transition needs (generating sprites, compiling attack
+timelines) is handed to a worker thread while the current scene keeps
+updating and rendering. The SceneManager only switches scenes once that
+work is done, so the switch itself never stalls a frame.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+class Preloader:
+    """Runs preparation jobs on a single worker thread, keyed by what they produce"""
+    def __init__(self):
+        self.executor = None  # started on the first job
+        self.jobs = {}  # key -> Future
+    
+    def submit(self, key, job, *args):
+        """Start job(*args) in the background, unless `key` is already being prepared"""
+        if key not in self.jobs:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preload")
+            self.jobs[key] = self.executor.submit(job, *args)
+    
+    def pending(self, key):
+        """True while the job for `key` is still running"""
+        job = self.jobs.get(key)
+        return job is not None and not job.done()
+    
+    def take(self, key, default=None):
+        """The result for `key` (waiting for it if needed), or default if never submitted"""
+        job = self.jobs.pop(key, None)
+        if job is None:
+            return default
+        return job.result()
+    
+    def shutdown(self):
+        """Stop the worker, dropping jobs that haven't started"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        self.jobs.clear()
+
+class SceneManager:
+    """Holds a scene switch until the next scene is prepared, then commits it.
+    The game's own state says which scene is current; commit() changes it"""
+    def __init__(self, preloader):
+        self.preloader = preloader
+        self.pending = None  # (scene, commit) waiting for its preparation
+    
+    @property
+    def transitioning(self):
+        return self.pending is not None
+    
+    def switch(self, scene, prepare=None, commit=None):
+        """Switch to `scene` once prepare() has run on the worker; commit(result) then runs here"""
+        if prepare is not None:
+            self.preloader.submit(("scene", scene), prepare)
+        self.pending = (scene, commit)
+    
+    def update(self):
+        """Commit the pending switch if its preparation is done"""
+        if self.pending is not None:
+            scene, commit = self.pending
+            if self.preloader.pending(("scene", scene)):
+                return
+            result = self.preloader.take(("scene", scene))
+            self.pending = None
+            if commit is not None:
+                commit(result)
+
+# Global preloader shared by every scene
+preloader = Preloader()
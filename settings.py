@@ -1,7 +1,11 @@
 # Game Settings
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
-FPS = 60
+FPS = 60  # display frame cap (0 = uncapped); independent of the simulation rate
+
+# Simulation runs at a fixed tick rate; every timer and speed is per tick
+SIM_RATE = 60
+MAX_TICKS_PER_FRAME = 5  # catch-up limit, so a long stall can't snowball
 
 # Colors (RGB)
 BLACK = (0, 0, 0)
@@ -28,9 +32,95 @@ COMBAT_BOX_WIDTH = 400
 COMBAT_BOX_HEIGHT = 300
 
 # UI settings
+MENU_STAR_COUNT = 50
 UI_FONT_SIZE = 24
 SMALL_FONT_SIZE = 16
 
 # Attack settings
 BULLET_SIZE = 8
 ATTACK_DURATION = 180  # frames (3 seconds at 60fps)
+
+# Encounters: the enemies fought together, as (name, max HP, sprite center).
+# Every enemy in an encounter fires into one shared bullet world
+ENCOUNTERS = {
+    "single": [("Test Enemy", 50, (SCREEN_WIDTH - 150, 80))],
+    "pair": [("Left Twin", 40, (SCREEN_WIDTH - 330, 80)),
+             ("Right Twin", 40, (SCREEN_WIDTH - 150, 80))],
+    "trio": [("Scout", 30, (SCREEN_WIDTH - 510, 80)),
+             ("Gunner", 30, (SCREEN_WIDTH - 330, 80)),
+             ("Captain", 40, (SCREEN_WIDTH - 150, 80))],
+}
+DEFAULT_ENCOUNTER = "single"
+
+# Collision grid: a soul-sized query touches at most 2x2 cells
+HASH_CELL_SIZE = PLAYER_SIZE + BULLET_SIZE
+# Pools smaller than this test every bullet directly even when the grid is
+# built. The soul's collision test always does: every update moves the
+# bullets and leaves the grid out of date, and one test is cheaper than a
+# rebuild. The grid serves query_radius callers such as difficulty.py
+HASH_MIN_BULLETS = 2048
+
+# Bullets only hit when their visible pixels touch the heart's; the sprite
+# masks are tested only for bullets whose rect already overlaps the player
+PIXEL_PERFECT_COLLISION = True
+
+# Particle sprite cache
+PARTICLE_ALPHA_STEPS = 16  # distinct fade levels per particle sprite
+PARTICLE_CACHE_SIZE = 1024  # sprites kept (at most 8x8 px each) before the least recently used is dropped
+
+# Text render cache
+TEXT_CACHE_SIZE = 256  # rendered strings kept before the least recently used is dropped
+TEXT_SCALE_STEPS = 64  # scaled text is snapped to 1/64 steps so it can be reused
+
+# Dirty rectangle rendering: fall back to a full flip past either limit
+DIRTY_AREA_THRESHOLD = 0.5  # fraction of the screen
+DIRTY_MAX_RECTS = 64
+
+# Frames are drawn RENDER_SCALE times smaller than the SCREEN_WIDTH x
+# SCREEN_HEIGHT window on each side, then upscaled once per frame: by SDL
+# ("scaled", on the GPU where there is one) or in software, one dirty rect
+# at a time ("nearest"). Scales must divide the screen size evenly
+RENDER_SCALE = 1
+RENDER_SCALES = (1, 2)  # text is unreadable any smaller
+RENDER_UPSCALE = "scaled"
+
+# Step fights on a worker thread while the main thread draws the previous
+# tick's snapshot (see pipeline.py); frames show the fight one frame late
+PIPELINED_SIM = False
+
+# Per-frame telemetry (see telemetry.py)
+TELEMETRY_QUEUE_SIZE = 4096  # records waiting for the writer before new ones are dropped
+TELEMETRY_FILE_RECORDS = 216000  # records per file, an hour at 60 FPS
+TELEMETRY_MAX_FILES = 24  # files kept per session; the oldest is deleted
+TELEMETRY_FLUSH_INTERVAL = 1.0  # seconds between the writer's batches
+
+# Compiled attack timelines kept in memory, and seeded versions per random pattern
+TIMELINE_CACHE_SIZE = 64
+TIMELINE_VARIANTS = 16
+
+# Object pools, preallocated at startup. Once every object is in use a pool
+# drops the request, grows up to its max, or recycles its oldest object
+# The bullet limits are for a whole BulletWorld, across every behavior group
+BULLET_POOL_CAPACITY = 1024
+BULLET_POOL_MAX = 16384
+BULLET_POOL_POLICY = "grow"
+PARTICLE_POOL_CAPACITY = 512
+PARTICLE_POOL_MAX = 2048
+PARTICLE_POOL_POLICY = "recycle"
+EFFECT_POOL_CAPACITY = 32
+EFFECT_POOL_MAX = 64
+EFFECT_POOL_POLICY = "recycle"
+
+# Difficulty analysis heatmap resolution
+DANGER_CELL_SIZE = PLAYER_SIZE // 2
+
+# Sprite atlas: every generated sprite packed into one surface this wide
+SPRITE_ATLAS_WIDTH = 256
+SPRITE_CACHE_DIR = ".sprite_cache"  # next to the game's code; empty disables the disk cache
+
+# Launch to first presented frame, checked by main.py --profile-startup
+STARTUP_BUDGET_MS = 500
+
+# Frame profiler (F3 overlay, F4 CSV dump)
+PROFILE_FRAMES = 300  # frames kept in the ring buffer
+PROFILE_OVERLAY_REFRESH = 10  # frames between overlay redraws
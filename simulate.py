@@ -0,0 +1,77 @@
+"""
+Run whole fights headless and faster than real time, for balancing.
+
+    python simulate.py --fights 500 --policy random --seed 1
+    python simulate.py --fights 5000 --step 4       # coarser, faster steps
+"""
+
+import os
+import argparse
+import random
+import time
+
+# Never open a window, even if something asks pygame for a display
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from combat_sim import CombatSim
+from controls import *
+from settings import *
+
+MAX_FIGHT_TICKS = 60 * 60 * 10  # give up on a fight after 10 minutes of game time
+
+def idle_policy(sim, rng):
+    """Always FIGHT, never move during the dodge phase"""
+    if sim.state == "player_turn":
+        return INPUT_CONFIRM << PRESSED_SHIFT
+    return 0
+
+def random_policy(sim, rng):
+    """Always FIGHT, hold a random direction during the dodge phase"""
+    if sim.state == "player_turn":
+        return INPUT_CONFIRM << PRESSED_SHIFT
+    return rng.choice((0, INPUT_UP, INPUT_DOWN, INPUT_LEFT, INPUT_RIGHT))
+
+POLICIES = {
+    "idle": idle_policy,
+    "random": random_policy,
+}
+
+def run_fight(sim, policy, rng, max_ticks=MAX_FIGHT_TICKS, step=1):
+    """Play one fight to the end, `step` ticks per policy decision, and return the final state"""
+    sim.reset(rng.randrange(2 ** 32))
+    while not sim.finished and sim.ticks < max_ticks:
+        sim.step(policy(sim, rng), step)
+    return sim.state
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless combat simulation")
+    parser.add_argument("--fights", type=int, default=100, help="number of fights to run")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random", help="how the player plays")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible runs")
+    parser.add_argument("--encounter", choices=sorted(ENCOUNTERS), default=DEFAULT_ENCOUNTER,
+                        help="which enemies to fight")
+    parser.add_argument("--step", type=int, default=1,
+                        help="ticks per simulation step; larger steps are faster, with swept collision")
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    policy = POLICIES[args.policy]
+    sim = CombatSim(encounter=args.encounter)
+    
+    results = {}
+    total_ticks = 0
+    start = time.perf_counter()
+    for _ in range(args.fights):
+        outcome = run_fight(sim, policy, rng, step=args.step)
+        results[outcome] = results.get(outcome, 0) + 1
+        total_ticks += sim.ticks
+    elapsed = time.perf_counter() - start
+    
+    print(f"{args.fights} fights in {elapsed:.2f}s "
+          f"({args.fights / elapsed:.1f} fights/s, {total_ticks / elapsed:.0f} ticks/s)")
+    for outcome, count in sorted(results.items()):
+        print(f"  {outcome}: {count} ({100 * count / args.fights:.1f}%)")
+    print(f"  mean fight length: {total_ticks / args.fights:.0f} ticks")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Uniform grid over the combat box for proximity queries.
+Items are bucketed by the cell holding their top-left corner, so a query
+only has to look at the few cells around the area it asks about.
+"""
+
+import numpy as np
+from settings import *
+
+class SpatialHash:
+    def __init__(self, cell_size=HASH_CELL_SIZE,
+                 bounds=(COMBAT_BOX_X, COMBAT_BOX_Y, COMBAT_BOX_WIDTH, COMBAT_BOX_HEIGHT)):
+        self.cell_size = cell_size
+        self.left, self.top, width, height = bounds
+        self.cols = -(-width // cell_size)
+        self.rows = -(-height // cell_size)
+        
+        # Items sorted by cell, and where each cell's run starts in that order
+        self.order = np.zeros(0, dtype=np.intp)
+        self.starts = np.zeros(self.cols * self.rows + 1, dtype=np.intp)
+        self.center_x = np.zeros(0)
+        self.center_y = np.zeros(0)
+        self.max_size = 0
+    
+    def cell_coords(self, x, y):
+        """Column and row arrays for positions; anything outside the bounds lands in the border cells"""
+        col = np.minimum(np.maximum((x - self.left) // self.cell_size, 0), self.cols - 1)
+        row = np.minimum(np.maximum((y - self.top) // self.cell_size, 0), self.rows - 1)
+        return col.astype(np.intp), row.astype(np.intp)
+    
+    def cell_range(self, start, end, origin, count):
+        """Inclusive range of cells covering [start, end] along one axis"""
+        first = int((start - origin) // self.cell_size)
+        last = int((end - origin) // self.cell_size)
+        return min(max(first, 0), count - 1), min(max(last, 0), count - 1)
+    
+    def rebuild(self, left, top, size):
+        """Re-bucket every item from its integer top-left corner and size"""
+        col, row = self.cell_coords(left, top)
+        # Cell ids are small, so a stable sort on int16 keys is a radix sort
+        cells = (row * self.cols + col).astype(np.int16)
+        self.order = np.argsort(cells, kind='stable')
+        counts = np.bincount(cells, minlength=self.cols * self.rows)
+        self.starts[1:] = np.cumsum(counts)
+        self.center_x = left + size / 2
+        self.center_y = top + size / 2
+        self.max_size = int(size.max()) if len(size) else 0
+    
+    def query_rect(self, rect):
+        """Indices of items that may overlap `rect`, in ascending order"""
+        left, top, width, height = rect
+        # Items are bucketed by their top-left corner, so look up to one item
+        # size further up and left than the rect itself
+        col0, col1 = self.cell_range(left - self.max_size, left + width, self.left, self.cols)
+        row0, row1 = self.cell_range(top - self.max_size, top + height, self.top, self.rows)
+        
+        runs = []
+        for row in range(row0, row1 + 1):
+            # Cells of one row are consecutive, so each row is a single slice
+            first = row * self.cols
+            runs.append(self.order[self.starts[first + col0]:self.starts[first + col1 + 1]])
+        found = np.concatenate(runs)
+        found.sort()
+        return found
+    
+    def query_radius(self, x, y, radius):
+        """Indices of items whose center lies within `radius` of (x, y)"""
+        candidates = self.query_rect((x - radius, y - radius, 2 * radius, 2 * radius))
+        dx = self.center_x[candidates] - x
+        dy = self.center_y[candidates] - y
+        return candidates[dx * dx + dy * dy <= radius * radius]
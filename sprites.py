@@ -1,24 +1,70 @@
 import pygame
 import os
+import sys
+import json
+import hashlib
+import numpy as np
+import settings
 from settings import *
+from bullets import SPRITE_TYPES
+from render import view
+
+# Bullet sprite type -> sprite name
+BULLET_SPRITE_NAMES = {
+    'circle': 'bullet_circle',
+    'diamond': 'bullet_diamond',
+    'star': 'bullet_star',
+    'square': 'bullet_square'
+}
+
+# Sprites whose visible pixels are used for collision
+COLLISION_SPRITE_NAMES = ('player_heart',) + tuple(BULLET_SPRITE_NAMES.values())
+
+# Stands in for transparency in colorkeyed copies; no sprite uses it
+COLORKEY = (255, 0, 255)
+
+# Bump when the cache file layout changes
+SPRITE_CACHE_VERSION = 1
+
+# Settings the generated sprites depend on; changing any of them
+# invalidates the disk cache
+SPRITE_SETTINGS = ('PLAYER_SIZE', 'BULLET_SIZE', 'SPRITE_ATLAS_WIDTH',
+                   'BLACK', 'WHITE', 'RED', 'GREEN', 'BLUE', 'YELLOW', 'PURPLE', 'ORANGE',
+                   'GRAY', 'LIGHT_GRAY', 'DARK_GRAY')
 
 class SpriteManager:
-    def __init__(self):
+    def __init__(self, divisor=1):
         self.sprites = {}
-        self.load_sprites()
+        # Sprites are shrunk to match a render target `divisor` times
+        # smaller than the screen
+        self.divisor = divisor
+        # Generating and packing the sprites is skipped when the disk cache
+        # already holds an atlas made by the same code and settings
+        if not self.load_cached_atlas():
+            self.load_sprites()
+            self.pack_atlas()
+            self.save_cached_atlas()
+        self.build_atlas()
     
     def load_sprites(self):
         """Load all sprite images"""
         # Create basic sprites programmatically if image files don't exist
         self.create_basic_sprites()
+        if self.divisor > 1:
+            self.shrink_sprites()
+    
+    def shrink_sprites(self):
+        """Scale every sprite down by the divisor, nearest-neighbour so edges stay hard"""
+        for name, sprite in self.sprites.items():
+            width, height = sprite.get_size()
+            size = (max(width // self.divisor, 1), max(height // self.divisor, 1))
+            self.sprites[name] = pygame.transform.scale(sprite, size)
     
     def create_basic_sprites(self):
         """Create basic sprites programmatically using pygame surfaces"""
         
-        # Player heart sprite (red heart with outline)
-        heart_surface = pygame.Surface((PLAYER_SIZE, PLAYER_SIZE), pygame.SRCALPHA)
-        self.draw_heart(heart_surface, RED, PLAYER_SIZE)
-        self.sprites['player_heart'] = heart_surface
+        # Player heart and bullet sprites
+        self.sprites.update(self.draw_collision_sprites())
         
         # Player heart damaged (darker red with flicker effect)
         heart_damaged = pygame.Surface((PLAYER_SIZE, PLAYER_SIZE), pygame.SRCALPHA)
@@ -30,13 +76,23 @@ class SpriteManager:
         self.draw_enemy(enemy_surface)
         self.sprites['enemy_basic'] = enemy_surface
         
-        # Bullet sprites with different shapes
-        self.create_bullet_sprites()
-        
         # UI elements
         self.create_ui_sprites()
     
-    def draw_heart(self, surface, color, size):
+    @classmethod
+    def draw_collision_sprites(cls):
+        """Draw just the COLLISION_SPRITE_NAMES sprites, on their own surfaces"""
+        # Player heart sprite (red heart with outline)
+        heart_surface = pygame.Surface((PLAYER_SIZE, PLAYER_SIZE), pygame.SRCALPHA)
+        cls.draw_heart(heart_surface, RED, PLAYER_SIZE)
+        sprites = {'player_heart': heart_surface}
+        
+        # Bullet sprites with different shapes
+        sprites.update(cls.draw_bullet_sprites())
+        return sprites
+    
+    @staticmethod
+    def draw_heart(surface, color, size):
         """Draw a heart shape on the given surface"""
         # Simple heart using circles and triangle
         center_x, center_y = size // 2, size // 2
@@ -75,15 +131,17 @@ class SpriteManager:
         # Mouth (simple line)
         pygame.draw.line(surface, WHITE, (center_x - 6, center_y + 6), (center_x + 6, center_y + 6), 2)
     
-    def create_bullet_sprites(self):
+    @classmethod
+    def draw_bullet_sprites(cls):
         """Create different bullet sprites"""
         bullet_size = BULLET_SIZE
+        sprites = {}
         
         # Standard bullet (circle)
         bullet_circle = pygame.Surface((bullet_size, bullet_size), pygame.SRCALPHA)
         pygame.draw.circle(bullet_circle, YELLOW, (bullet_size//2, bullet_size//2), bullet_size//2)
         pygame.draw.circle(bullet_circle, WHITE, (bullet_size//2, bullet_size//2), bullet_size//2, 1)
-        self.sprites['bullet_circle'] = bullet_circle
+        sprites['bullet_circle'] = bullet_circle
         
         # Diamond bullet
         bullet_diamond = pygame.Surface((bullet_size, bullet_size), pygame.SRCALPHA)
@@ -95,20 +153,22 @@ class SpriteManager:
         ]
         pygame.draw.polygon(bullet_diamond, BLUE, points)
         pygame.draw.polygon(bullet_diamond, WHITE, points, 1)
-        self.sprites['bullet_diamond'] = bullet_diamond
+        sprites['bullet_diamond'] = bullet_diamond
         
         # Star bullet
         bullet_star = pygame.Surface((bullet_size, bullet_size), pygame.SRCALPHA)
-        self.draw_star(bullet_star, ORANGE, bullet_size//2, bullet_size//2, bullet_size//2)
-        self.sprites['bullet_star'] = bullet_star
+        cls.draw_star(bullet_star, ORANGE, bullet_size//2, bullet_size//2, bullet_size//2)
+        sprites['bullet_star'] = bullet_star
         
         # Square bullet
         bullet_square = pygame.Surface((bullet_size, bullet_size), pygame.SRCALPHA)
         pygame.draw.rect(bullet_square, PURPLE, (0, 0, bullet_size, bullet_size))
         pygame.draw.rect(bullet_square, WHITE, (0, 0, bullet_size, bullet_size), 1)
-        self.sprites['bullet_square'] = bullet_square
+        sprites['bullet_square'] = bullet_square
+        return sprites
     
-    def draw_star(self, surface, color, center_x, center_y, radius):
+    @staticmethod
+    def draw_star(surface, color, center_x, center_y, radius):
         """Draw a star shape"""
         import math
         points = []
@@ -138,27 +198,137 @@ class SpriteManager:
         pygame.draw.rect(button_hover, YELLOW, (0, 0, 200, 40), 2)
         self.sprites['button_hover'] = button_hover
     
+    def pack_atlas(self):
+        """Pack every sprite into one RGBA atlas"""
+        # Shelf packing, tallest sprites first
+        width = max([SPRITE_ATLAS_WIDTH] + [sprite.get_width() for sprite in self.sprites.values()])
+        x = y = shelf_height = 0
+        self.atlas_rects = {}
+        for name, sprite in sorted(self.sprites.items(), key=lambda item: -item[1].get_height()):
+            sprite_width, sprite_height = sprite.get_size()
+            if x + sprite_width > width:
+                x = 0
+                y += shelf_height + 1
+                shelf_height = 0
+            self.atlas_rects[name] = pygame.Rect(x, y, sprite_width, sprite_height)
+            x += sprite_width + 1  # a pixel of padding keeps neighbours from bleeding
+            shelf_height = max(shelf_height, sprite_height)
+        
+        self.atlas = pygame.Surface((width, y + shelf_height), pygame.SRCALPHA)
+        for name, rect in self.atlas_rects.items():
+            # RGBA_MAX onto a cleared surface copies pixels exactly, alpha included
+            self.atlas.blit(self.sprites[name], rect, special_flags=pygame.BLEND_RGBA_MAX)
+    
+    def build_atlas(self):
+        """Convert the atlas to display format; sprites become views into it"""
+        # Match the display's pixel format so blits skip per-pixel conversion
+        if pygame.display.get_surface() is not None:
+            self.atlas = self.atlas.convert_alpha()
+        for name, rect in self.atlas_rects.items():
+            self.sprites[name] = self.atlas.subsurface(rect)
+        
+        # Atlas area of each bullet sprite, indexed like BulletPool.sprite
+        self.bullet_areas = [self.atlas_rects[BULLET_SPRITE_NAMES[name]] for name in SPRITE_TYPES]
+        self.bullet_half_widths = np.array([area.width // 2 for area in self.bullet_areas])
+        self.bullet_half_heights = np.array([area.height // 2 for area in self.bullet_areas])
+        
+        # Bullets have hard edges, so they can be drawn from a colorkeyed copy
+        # of the atlas, which blits about twice as fast as per-pixel alpha
+        self.bullet_atlas = self.atlas
+        if all(self.has_hard_edges(self.sprites[BULLET_SPRITE_NAMES[name]]) for name in SPRITE_TYPES):
+            keyed = pygame.Surface(self.atlas.get_size())
+            keyed.fill(COLORKEY)
+            keyed.blit(self.atlas, (0, 0))
+            keyed.set_colorkey(COLORKEY)
+            if pygame.display.get_surface() is not None:
+                keyed = keyed.convert()
+            self.bullet_atlas = keyed
+    
+    def cache_key(self):
+        """Hash of everything the generated sprites depend on"""
+        digest = hashlib.sha1()
+        digest.update(f"{SPRITE_CACHE_VERSION}:{pygame.version.ver}:{self.divisor}:".encode())
+        # The generator code is this module; reading it is cheaper than inspect
+        with open(os.path.abspath(__file__), "rb") as source_file:
+            digest.update(source_file.read())
+        digest.update(repr([getattr(settings, name) for name in SPRITE_SETTINGS]).encode())
+        return digest.hexdigest()[:16]
+    
+    @staticmethod
+    def cache_paths(key):
+        """(index, pixels) files for a cache key"""
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), SPRITE_CACHE_DIR)
+        base = os.path.join(directory, f"sprites-{key}")
+        return base + ".json", base + ".rgba"
+    
+    def load_cached_atlas(self):
+        """Load the packed atlas from the disk cache; False if there is no valid entry"""
+        if not SPRITE_CACHE_DIR:
+            return False
+        try:
+            index_path, pixels_path = self.cache_paths(self.cache_key())
+            with open(index_path) as index_file:
+                index = json.load(index_file)
+            with open(pixels_path, "rb") as pixels_file:
+                pixels = pixels_file.read()
+            size = tuple(index["size"])
+            if len(pixels) != size[0] * size[1] * 4:
+                return False
+            # frombuffer shares the bytes; copy so the atlas owns its pixels
+            self.atlas = pygame.image.frombuffer(pixels, size, "RGBA").copy()
+            self.atlas_rects = {name: pygame.Rect(rect) for name, rect in index["rects"].items()}
+            return True
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+    
+    def save_cached_atlas(self):
+        """Write the packed atlas to the disk cache and drop stale entries"""
+        if not SPRITE_CACHE_DIR:
+            return
+        try:
+            key = self.cache_key()
+            index_path, pixels_path = self.cache_paths(key)
+            directory = os.path.dirname(index_path)
+            os.makedirs(directory, exist_ok=True)
+            
+            # Only the entry for the current code, settings and scale is kept
+            for name in os.listdir(directory):
+                if name.startswith("sprites-") and not name.startswith(f"sprites-{key}."):
+                    os.remove(os.path.join(directory, name))
+            
+            # Pixels first, index last: the index only exists once the pixels do
+            index = {"size": list(self.atlas.get_size()),
+                     "rects": {name: list(rect) for name, rect in self.atlas_rects.items()}}
+            for path, data, mode in ((pixels_path, pygame.image.tostring(self.atlas, "RGBA"), "wb"),
+                                     (index_path, json.dumps(index), "w")):
+                with open(path + ".tmp", mode) as cache_file:
+                    cache_file.write(data)
+                os.replace(path + ".tmp", path)
+        except OSError as error:
+            # A read-only install still works, it just regenerates every launch
+            print(f"Sprite cache not written: {error}", file=sys.stderr)
+    
+    @staticmethod
+    def has_hard_edges(sprite):
+        """True if every pixel is either fully opaque or fully transparent"""
+        alpha = pygame.surfarray.array_alpha(sprite)
+        return bool(((alpha == 0) | (alpha == 255)).all())
+    
     def get_sprite(self, name):
         """Get a sprite by name"""
         return self.sprites.get(name, None)
     
     def get_bullet_sprite(self, bullet_type):
         """Get bullet sprite based on type"""
-        sprite_map = {
-            'circle': 'bullet_circle',
-            'diamond': 'bullet_diamond', 
-            'star': 'bullet_star',
-            'square': 'bullet_square'
-        }
-        sprite_name = sprite_map.get(bullet_type, 'bullet_circle')
+        sprite_name = BULLET_SPRITE_NAMES.get(bullet_type, 'bullet_circle')
         return self.get_sprite(sprite_name)
 
 # Global sprite manager instance
 sprite_manager = None
 
 def get_sprite_manager():
-    """Get the global sprite manager instance"""
+    """Get the global sprite manager instance, for the current render scale"""
     global sprite_manager
-    if sprite_manager is None:
-        sprite_manager = SpriteManager()
+    if sprite_manager is None or sprite_manager.divisor != view.divisor:
+        sprite_manager = SpriteManager(view.divisor)
     return sprite_manager
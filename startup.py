@@ -0,0 +1,65 @@
+"""
+Startup profiling for `python main.py --profile-startup`.
+main.py installs an import hook before anything else is imported, so the
+time each module takes to import is recorded; Game then marks when it is
+built and when the first frame is on screen. The report compares time to
+first frame with STARTUP_BUDGET_MS.
+"""
+
+import builtins
+import sys
+import time
+
+class StartupProfiler:
+    def __init__(self, start):
+        self.start = start  # perf_counter() when main.py started running
+        self.marks = []  # (label, seconds since start)
+        self.imports = {}  # module -> [total seconds, own seconds]
+        self.stack = []  # children time of each import in progress
+        self.original_import = None
+    
+    def install(self):
+        """Time every module imported from now on"""
+        self.original_import = builtins.__import__
+        builtins.__import__ = self.timed_import
+    
+    def uninstall(self):
+        if self.original_import is not None:
+            builtins.__import__ = self.original_import
+            self.original_import = None
+    
+    def timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Only first imports cost anything; the rest are sys.modules lookups
+        if level or name in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+        self.stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            self.imports[name] = [elapsed, elapsed - children]
+    
+    def mark(self, label):
+        """Record that startup reached `label`"""
+        self.marks.append((label, time.perf_counter() - self.start))
+    
+    def report(self, budget_ms, top=15, out=sys.stderr):
+        """Print import times and milestones; True if the first frame was within budget"""
+        print("Slowest imports (own ms / with dependencies ms):", file=out)
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        for name, (total, own) in slowest:
+            print(f"  {own * 1000:8.1f} {total * 1000:8.1f}  {name}", file=out)
+        
+        print("Milestones (ms since launch):", file=out)
+        for label, elapsed in self.marks:
+            print(f"  {elapsed * 1000:8.1f}  {label}", file=out)
+        
+        first_frame_ms = self.marks[-1][1] * 1000 if self.marks else 0.0
+        within_budget = first_frame_ms <= budget_ms
+        status = "within" if within_budget else "OVER"
+        print(f"Time to first frame {first_frame_ms:.1f} ms, {status} the {budget_ms} ms budget", file=out)
+        return within_budget
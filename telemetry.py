@@ -0,0 +1,177 @@
+"""
+Per-frame telemetry for play sessions (`python main.py --telemetry DIR`).
+Game.run hands one fixed-size binary record per frame to a TelemetrySink,
+which only appends it to a bounded queue; a background thread batches the
+queue into rotating files, so the game never waits on disk. When the
+queue is full the record is dropped and counted rather than blocking the
+frame. Files are a small header followed by packed records, which the
+reader maps straight into a NumPy structured array:
+
+    python main.py --telemetry telemetry/          # record while playing
+    python telemetry.py telemetry/*.tlm            # summarize recorded frames
+"""
+
+import os
+import sys
+import glob
+import argparse
+import struct
+import threading
+import time
+from collections import deque
+import numpy as np
+from settings import *
+
+TELEMETRY_MAGIC = b"TLMF"
+TELEMETRY_VERSION = 1
+
+# magic, version, record size
+HEADER = struct.Struct("<4sHH")
+
+# One record per frame. `hits` counts hits taken so far this fight, and
+# `attack` is the targeted enemy's current attack, or -1 outside a fight.
+# `frame` numbers are consecutive within a session, so gaps are drops
+RECORD = struct.Struct("<IfIIhHbB")
+RECORD_DTYPE = np.dtype([("frame", "<u4"), ("frame_ms", "<f4"), ("bullets", "<u4"),
+                         ("particles", "<u4"), ("player_hp", "<i2"), ("hits", "<u2"),
+                         ("attack", "i1"), ("state", "u1")])
+STATES = ["menu", "player_turn", "turn_transition", "enemy_turn", "victory", "game_over"]
+
+class TelemetrySink:
+    """Queues frame records for a writer thread that batches them into rotating files"""
+    def __init__(self, directory, queue_size=TELEMETRY_QUEUE_SIZE, file_records=TELEMETRY_FILE_RECORDS,
+                 max_files=TELEMETRY_MAX_FILES, flush_interval=TELEMETRY_FLUSH_INTERVAL):
+        self.directory = directory
+        self.prefix = f"session_{time.strftime('%Y%m%d_%H%M%S')}"
+        self.file_records = file_records
+        self.max_files = max_files
+        self.flush_interval = flush_interval
+        
+        # One producer (the game loop) and one consumer (the writer): deque
+        # appends and pops are atomic, so neither side ever takes a lock
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.frame = 0
+        self.dropped = 0  # records lost to a full queue
+        
+        self.files = []  # paths written this session, oldest first
+        self.file = None
+        self.records_in_file = 0
+        self.stopping = threading.Event()
+        self.writer = None  # started on the first record
+    
+    def record(self, frame_ms, bullets, particles, player_hp, hits, attack, state):
+        """Queue one frame's record; never blocks, drops it if the writer is behind"""
+        frame = self.frame
+        self.frame += 1
+        if len(self.queue) >= self.queue_size:
+            self.dropped += 1
+            return
+        self.queue.append(RECORD.pack(frame, frame_ms, bullets, particles, player_hp,
+                                      hits, attack, STATES.index(state)))
+        if self.writer is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.writer = threading.Thread(target=self.write_loop, name="telemetry", daemon=True)
+            self.writer.start()
+    
+    def write_loop(self):
+        """Writer thread: flush the queue every flush_interval until closed"""
+        while not self.stopping.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+    
+    def flush(self):
+        """Write every queued record, starting a new file whenever one is full"""
+        queue = self.queue
+        while queue:
+            if self.file is None or self.records_in_file >= self.file_records:
+                self.rotate()
+            # Only take what was queued when the batch started
+            batch = [queue.popleft() for _ in range(min(len(queue), self.file_records - self.records_in_file))]
+            self.file.write(b"".join(batch))
+            self.records_in_file += len(batch)
+        if self.file is not None:
+            self.file.flush()
+    
+    def rotate(self):
+        """Close the current file and open the next, deleting the oldest past max_files"""
+        if self.file is not None:
+            self.file.close()
+        path = os.path.join(self.directory, f"{self.prefix}_{len(self.files):04d}.tlm")
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(TELEMETRY_MAGIC, TELEMETRY_VERSION, RECORD.size))
+        self.records_in_file = 0
+        self.files.append(path)
+        if len(self.files) > self.max_files:
+            os.remove(self.files[-self.max_files - 1])
+    
+    def close(self):
+        """Write what is queued and stop the writer; returns the number of dropped records"""
+        if self.writer is not None:
+            self.stopping.set()
+            self.writer.join()
+            self.writer = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        return self.dropped
+
+def load_telemetry(path):
+    """Map a telemetry file's records without copying them; a record still being written is left out"""
+    with open(path, "rb") as telemetry_file:
+        header = telemetry_file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"{path} is not a telemetry file")
+    magic, version, record_size = HEADER.unpack(header)
+    if magic != TELEMETRY_MAGIC or version != TELEMETRY_VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a version {TELEMETRY_VERSION} telemetry file")
+    count = (os.path.getsize(path) - HEADER.size) // record_size
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size, shape=(count,))
+
+def summarize(records):
+    """Frame time percentiles, peaks, hits and drops for a run of records"""
+    # Frame numbers and hit counts restart with each session and each fight,
+    # so only count the steps up
+    gaps = np.diff(records["frame"].astype(np.int64))
+    hits = np.diff(records["hits"].astype(np.int64), prepend=0)
+    return {
+        "frames": len(records),
+        "dropped": int((gaps[gaps > 1] - 1).sum()),
+        "median_ms": float(np.median(records["frame_ms"])),
+        "p95_ms": float(np.percentile(records["frame_ms"], 95)),
+        "p99_ms": float(np.percentile(records["frame_ms"], 99)),
+        "max_bullets": int(records["bullets"].max()),
+        "max_particles": int(records["particles"].max()),
+        "hits": int(hits[hits > 0].sum()),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize recorded telemetry")
+    parser.add_argument("files", nargs="+", help="telemetry files (globs are expanded)")
+    args = parser.parse_args()
+    
+    paths = sorted(path for pattern in args.files for path in (glob.glob(pattern) or [pattern]))
+    parts = [load_telemetry(path) for path in paths]
+    records = np.concatenate(parts) if len(parts) > 1 else parts[0]
+    if not len(records):
+        print("No frames recorded")
+        sys.exit(1)
+    
+    stats = summarize(records)
+    print(f"{stats['frames']} frames from {len(paths)} file(s), {stats['dropped']} dropped")
+    print(f"frame time median {stats['median_ms']:.2f} ms  p95 {stats['p95_ms']:.2f} ms  "
+          f"p99 {stats['p99_ms']:.2f} ms")
+    print(f"peak {stats['max_bullets']} bullets, {stats['max_particles']} particles, "
+          f"{stats['hits']} hits taken")
+    
+    # Frame times per attack, for the frames spent dodging one
+    dodging = records[records["state"] == STATES.index("enemy_turn")]
+    for attack in np.unique(dodging["attack"]).tolist():
+        times = dodging["frame_ms"][dodging["attack"] == attack]
+        print(f"  attack {attack}: {len(times)} frames, median {np.median(times):.2f} ms, "
+              f"p99 {np.percentile(times, 99):.2f} ms")
+
+if __name__ == "__main__":
+    main()
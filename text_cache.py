@@ -0,0 +1,55 @@
+"""
+Shared cache of rendered text.
+Most UI strings are the same from one frame to the next, so each
+(font, text, antialias, color, scale) is rasterized once and reused.
+"""
+
+import pygame
+from collections import OrderedDict
+from settings import *
+
+class TextCache:
+    def __init__(self, max_surfaces=TEXT_CACHE_SIZE, scale_steps=TEXT_SCALE_STEPS):
+        self.max_surfaces = max_surfaces
+        self.scale_steps = scale_steps
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def render(self, font, text, antialias, color, scale=1.0):
+        """Rendered text, scaled to the nearest 1/scale_steps"""
+        scale = round(scale * self.scale_steps) / self.scale_steps
+        key = (font, text, antialias, color, scale)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        
+        self.misses += 1
+        if scale == 1.0:
+            surface = font.render(text, antialias, color)
+        else:
+            # Scale the cached unscaled text rather than rasterizing again
+            surface = self.render(font, text, antialias, color)
+            size = (int(surface.get_width() * scale), int(surface.get_height() * scale))
+            surface = pygame.transform.scale(surface, size)
+        self.surfaces[key] = surface
+        
+        # Evict the least recently used text once over budget
+        if len(self.surfaces) > self.max_surfaces:
+            self.surfaces.popitem(last=False)
+        return surface
+    
+    def clear(self):
+        """Drop every cached surface and reset the counters"""
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+# Global text cache
+text_cache = TextCache()
+
+def render_text(font, text, antialias, color, scale=1.0):
+    """Render text through the global cache"""
+    return text_cache.render(font, text, antialias, color, scale)